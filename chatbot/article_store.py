@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from os_client import get_opensearch_client
+from resources import shared_resource
+from result_cache import get_index_version
+from settings import get_settings
+
+# Fields returned by search: enough to render the issue choices.
+# Everything else (passage, condensed passage, step guide, ...) is loaded
+# with load_article once the user has picked an issue.
+SEARCH_FIELDS = ["guide_title", "guide_file_name", "description"]
+
+DEFAULT_ARTICLE_CACHE = {
+    "max_bytes": 32 * 1024 * 1024,
+    "ttl_seconds": 3600,
+}
+
+
+class ArticleCache:
+    """
+    Process-wide LRU of full article sources keyed by document id, bounded
+    by the total size of the cached sources and by age. Shared by every
+    session, so a popular article is fetched once per process. Emptied when
+    the index version moves, like ResultCache.
+    """
+
+    def __init__(self, version, max_bytes, ttl_seconds=None):
+        self.version = version
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync(self, generation):
+        if generation != self._generation:
+            if self._generation is not None:
+                self._entries.clear()
+                self.bytes = 0
+                self.invalidations += 1
+            self._generation = generation
+
+    def get(self, doc_id):
+        """
+        :return: (source or None, the index version it was looked up under)
+        """
+        generation = self.version.current()
+        with self._lock:
+            self._sync(generation)
+            entry = self._entries.get(doc_id)
+            if entry is not None and self.ttl_seconds is not None and time.time() - entry[0] > self.ttl_seconds:
+                self._remove(doc_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, generation
+            self._entries.move_to_end(doc_id)
+            self.hits += 1
+            return entry[2], generation
+
+    def put(self, doc_id, source, generation):
+        """
+        :param generation: The index version the source was fetched under;
+                           it is not stored if the index has moved on since.
+        """
+        size = len(json.dumps(source).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            if doc_id in self._entries:
+                self._remove(doc_id)
+            self._entries[doc_id] = (time.time(), size, source)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, doc_id):
+        _, size, _ = self._entries.pop(doc_id)
+        self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+@shared_resource
+def get_article_cache():
+    settings = get_settings().section('article_cache', DEFAULT_ARTICLE_CACHE)
+    return ArticleCache(get_index_version(), settings['max_bytes'], settings['ttl_seconds'])
+
+
+def load_articles(doc_ids):
+    """
+    Full sources (without the embedding) for doc_ids, from the shared cache
+    or one _mget for the ones it is missing.
+    :return: Dict of doc id to source; ids not found in the index are left out.
+    """
+    cache = get_article_cache()
+    found = {}
+    missing = []
+    generation = None
+    for doc_id in doc_ids:
+        source, generation = cache.get(doc_id)
+        if source is None:
+            missing.append(doc_id)
+        else:
+            found[doc_id] = source
+
+    if missing:
+        response = get_opensearch_client().mget(
+            body={"ids": missing},
+            index=get_settings().opensearch_index,
+            _source_excludes="embedding",
+        )
+        for doc in response["docs"]:
+            if doc.get("found"):
+                cache.put(doc["_id"], doc["_source"], generation)
+                found[doc["_id"]] = doc["_source"]
+    return found
+
+
+def load_article(hit):
+    """
+    Fill in the full `_source` of a search hit that only carries SEARCH_FIELDS.
+    :return: The hit, updated in place, or None when the article has left the
+             index since the search (a reindex, or a cached search result).
+    """
+    if "passage" not in hit["_source"]:
+        source = load_articles([hit["_id"]]).get(hit["_id"])
+        if source is None:
+            return None
+        hit["_source"] = {**hit["_source"], **source}
+    return hit
@@ -0,0 +1,67 @@
+import boto3
+from botocore.config import Config
+from resources import shared_resource
+from settings import get_settings
+
+DEFAULT_CLIENT_SETTINGS = {
+    "max_pool_connections": 50,
+    "connect_timeout": 5,
+    "read_timeout": 120,
+    "tcp_keepalive": True,
+    "max_attempts": 3,
+}
+
+_clients_created = 0
+
+
+@shared_resource
+def get_bedrock_client():
+    """
+    The process-wide bedrock-runtime client. Every Streamlit session shares
+    this client and its connection pool.
+    """
+    global _clients_created
+    settings = get_settings().section('bedrock_client', DEFAULT_CLIENT_SETTINGS)
+    client_config = Config(
+        region_name=get_settings().region,
+        max_pool_connections=settings['max_pool_connections'],
+        connect_timeout=settings['connect_timeout'],
+        read_timeout=settings['read_timeout'],
+        tcp_keepalive=settings['tcp_keepalive'],
+        retries={"max_attempts": settings['max_attempts'], "mode": "standard"},
+    )
+    # boto3 sessions are not thread safe, but the clients they create are
+    client = boto3.session.Session().client("bedrock-runtime", config=client_config)
+    _clients_created += 1
+    return client
+
+
+def _connection_pools(client):
+    # botocore keeps one urllib3 PoolManager per endpoint; each pool it manages
+    # tracks how many connections it opened and how many requests it served.
+    manager = client._endpoint.http_session._manager
+    pools = manager.pools
+    with pools.lock:
+        return list(pools._container.values())
+
+
+def get_connection_stats():
+    """
+    Report connection reuse for the shared client.
+    :return: Dict with the number of requests sent, new connections (TLS
+             handshakes) opened, and requests served on a reused connection.
+    """
+    stats = {
+        "clients_created": _clients_created,
+        "requests": 0,
+        "new_connections": 0,
+        "reused_connections": 0,
+    }
+    if not _clients_created:
+        return stats
+
+    for pool in _connection_pools(get_bedrock_client()):
+        stats["requests"] += pool.num_requests
+        stats["new_connections"] += pool.num_connections
+    stats["reused_connections"] = max(stats["requests"] - stats["new_connections"], 0)
+    return stats
@@ -0,0 +1,79 @@
+"""
+Microbenchmark for the getSimilarDocs retrieval modes against a local stand-in.
+
+The stand-in client answers search/msearch from canned hits after sleeping for
+a simulated network round trip plus server time, so the modes can be compared
+without an OpenSearch endpoint. Run from the chatbot directory:
+
+    python bench_retrieval.py --rtt-ms 40 --server-ms 15 --iterations 50
+"""
+import argparse
+import random
+import time
+
+from os_query import RETRIEVAL_MODES, retrieve
+
+
+class StandInOpenSearch:
+    def __init__(self, rtt_ms, server_ms, hits=20, seed=0):
+        self.rtt = rtt_ms / 1000
+        self.server = server_ms / 1000
+        rng = random.Random(seed)
+        self._results = {
+            "match": self._hits(rng, hits, 1.0, 12.0),
+            "knn": self._hits(rng, hits, 0.3, 0.9),
+        }
+
+    @staticmethod
+    def _hits(rng, count, low, high):
+        ids = rng.sample(range(count * 2), count)
+        hits = [
+            {"_id": str(doc_id), "_score": rng.uniform(low, high),
+             "_source": {"guide_title": f"Guide {doc_id}", "passage": "..."}}
+            for doc_id in ids
+        ]
+        hits.sort(key=lambda hit: hit["_score"], reverse=True)
+        return {"hits": {"hits": hits}}
+
+    def _answer(self, body):
+        query_type = next(iter(body["query"]))
+        return self._results[query_type]
+
+    def search(self, index, body):
+        time.sleep(self.rtt + self.server)
+        return self._answer(body)
+
+    def msearch(self, body):
+        # The server fans the sub-searches out in parallel; one round trip.
+        time.sleep(self.rtt + self.server)
+        return {"responses": [self._answer(query) for query in body[1::2]]}
+
+
+def run(client, mode, iterations):
+    embedding = [0.0] * 1024
+    start = time.perf_counter()
+    for _ in range(iterations):
+        results = retrieve(client, "bench-index", "printer not working", embedding, mode)
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rtt-ms", type=float, default=40)
+    parser.add_argument("--server-ms", type=float, default=15)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    client = StandInOpenSearch(args.rtt_ms, args.server_ms)
+    baseline = None
+    print(f"{'mode':<12}{'ms/lookup':>12}  same results")
+    for mode in RETRIEVAL_MODES:
+        ms, results = run(client, mode, args.iterations)
+        if baseline is None:
+            baseline = results
+        print(f"{mode:<12}{ms:>12.1f}  {results == baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Import-time and first-request benchmark for the chatbot modules.
+
+Each module is imported in a fresh interpreter so its cost includes
+everything it pulls in, then the lazily built shared resources (config,
+clients, worker pools, tokenizer) are timed on first use. Nothing is sent
+to AWS. Run from the chatbot directory with a config.yaml in place:
+
+    python bench_startup.py --repeat 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = [
+    "settings",
+    "bedrock_client",
+    "os_client",
+    "search_utils",
+    "os_query",
+    "llm_utils",
+    "logging_config",
+    "turn_pipeline",
+]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def import_time(module, repeat):
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]) * 1000)
+    return statistics.median(samples)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    print(f"  {label:<32}{(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+
+def first_use():
+    from bedrock_client import get_bedrock_client
+    from os_client import get_opensearch_client
+    from search_utils import _embedding_cache
+    from settings import get_settings
+    from turn_pipeline import _executor
+    from usage import estimate_tokens
+
+    print("First use of shared resources (cold, then warm):")
+    for label in ("cold", "warm"):
+        print(f" {label}")
+        timed("config", get_settings)
+        timed("bedrock-runtime client", get_bedrock_client)
+        timed("OpenSearch client", get_opensearch_client)
+        timed("embedding cache", _embedding_cache)
+        timed("turn worker pool", _executor)
+        timed("pre-flight token estimate", lambda: estimate_tokens("printer not working"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Import time (median of {args.repeat} fresh interpreters):")
+    for module in MODULES:
+        print(f"  {module:<32}{import_time(module, args.repeat):>10.1f} ms")
+    first_use()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from bedrock_client import get_bedrock_client
+from control_signals import ControlStreamParser
+from logging_config import get_logger
+from prompt_builder import build_chat_request
+from resources import shared_resource
+from settings import get_settings
+from turn_pipeline import submit_background
+from usage import usage_from_body
+
+DEFAULT_CANNED_SETTINGS = {
+    "enabled": True,
+    "variants": 3,
+    "refresh_seconds": 86400,
+}
+
+
+def generate_variant(instructions, simulated_input, static_prefix=None):
+    """
+    Run one context-free turn (empty history) without streaming.
+    :return: ({"text", "signals"} as the chat UI would have shown it, Usage)
+    """
+    config = get_settings()
+    body = build_chat_request([], simulated_input, instructions, static_prefix=static_prefix)
+    # Only meaningful for streaming responses
+    body.pop("amazon-bedrock-guardrailConfig", None)
+
+    response = get_bedrock_client().invoke_model(
+        body=json.dumps(body),
+        modelId=config.model.chat,
+        guardrailIdentifier=config.guardrail_id,
+        guardrailVersion=config.guardrail_version,
+    )
+    response_body = json.loads(response.get("body").read())
+    text = response_body.get("content")[0].get("text")
+
+    signals = None
+    if static_prefix:
+        parser = ControlStreamParser()
+        text = parser.feed(text) + parser.finish()
+        signals = parser.signals
+    return {"text": text.rstrip(), "signals": signals}, usage_from_body(response_body)
+
+
+def replay(text):
+    """
+    Yield a stored reply word by word for st.write_stream.
+    """
+    for piece in re.findall(r"\s*\S+\s*", text):
+        yield piece
+
+
+class CannedTurnCache:
+    """
+    Process-wide pool of pre-generated replies for the fixed opening turns
+    (greeting, step-style question). Keys hash the prompt template, simulated
+    input and control instructions together with the helpdesk and model id,
+    so any prompt edit maps to a fresh pool. Pools older than refresh_seconds
+    keep serving while a replacement is generated in the background.
+    """
+
+    def __init__(self, variants=3, refresh_seconds=86400):
+        self.variants = variants
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._filling = set()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(instructions, simulated_input, helpdesk, model_id, static_prefix=None):
+        template = json.dumps([static_prefix, instructions, simulated_input])
+        template_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()
+        return (template_hash, helpdesk, model_id)
+
+    def get(self, key):
+        """
+        :return: A random stored variant, or None on a miss.
+        """
+        with self._lock:
+            pool = self._pools.get(key)
+            if not pool or not pool["variants"]:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return random.choice(pool["variants"])
+
+    def _needs_fill(self, key):
+        pool = self._pools.get(key)
+        if pool is None or len(pool["variants"]) < self.variants:
+            return True
+        return time.time() - pool["created"] > self.refresh_seconds
+
+    def refresh(self, key, instructions, simulated_input, static_prefix=None):
+        """
+        Top up or regenerate the pool for key in the background if it is
+        short or stale. Returns at once.
+        :return: The Future of the fill, resolving to the Usage of every
+                 model call it made, or None when no fill was started.
+        """
+        with self._lock:
+            if key in self._filling or not self._needs_fill(key):
+                return None
+            self._filling.add(key)
+        return submit_background(self._fill, key, instructions, simulated_input, static_prefix)
+
+    def _fill(self, key, instructions, simulated_input, static_prefix):
+        try:
+            variants = []
+            usages = []
+            for _ in range(self.variants):
+                try:
+                    variant, usage = generate_variant(instructions, simulated_input, static_prefix)
+                except Exception as e:
+                    get_logger(__name__).warning(f"Canned turn generation failed: {e}")
+                    continue
+                usages.append(usage)
+                # A reply without a readable control block would fall back to the flag classifier on every replay
+                if static_prefix and variant["signals"] is None:
+                    continue
+                variants.append(variant)
+            if variants:
+                with self._lock:
+                    self._pools[key] = {"variants": variants, "created": time.time()}
+            return usages
+        finally:
+            with self._lock:
+                self._filling.discard(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "pools": len(self._pools),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def record_fills(fills, ledger):
+    """
+    Record the model calls of finished pool fills in ledger, under the
+    "canned_fill" phase. The session that started a fill pays for it.
+    :param fills: Futures returned by CannedTurnCache.refresh.
+    :return: The fills still running.
+    """
+    running = []
+    for fill in fills:
+        if not fill.done():
+            running.append(fill)
+            continue
+        try:
+            usages = fill.result()
+        except Exception as e:
+            get_logger(__name__).warning(f"Canned turn fill failed: {e}")
+            continue
+        for usage in usages:
+            ledger.record(get_settings().model.chat, "canned_fill", usage)
+    return running
+
+
+@shared_resource
+def get_turn_cache():
+    settings = get_settings().section('canned_turns', DEFAULT_CANNED_SETTINGS)
+    return CannedTurnCache(settings['variants'], settings['refresh_seconds'])
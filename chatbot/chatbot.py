@@ -3,27 +3,39 @@ import json
 import re
 from datetime import datetime
 
-import boto3
 import streamlit as st
-import tiktoken
-import yaml
+from article_store import load_article
+from bedrock_client import get_bedrock_client
+from canned_turns import DEFAULT_CANNED_SETTINGS, get_turn_cache, record_fills, replay
+from condensed_passage import chat_passage
+from cost_ledger import CostLedger
+from history_window import HistoryWindow
+from control_signals import (
+    CONTROL_INSTRUCTIONS,
+    SIGNAL_DEFAULTS,
+    ControlStreamParser,
+    signals_from_flag,
+    signals_from_text,
+)
 from llm_utils import *
-from logging_config import log_chat, save_results
-from os_query import getSimilarDocs
-from search_utils import embed
+from logging_config import get_logger, log_chat, save_results
+from os_query import forget_document, getSimilarDocs, retrieval_stats
+from postprocess import get_postprocess_stats
+from prompt_builder import build_chat_request
+from settings import get_settings
+from step_guides import stored_guide
 from streamlit_star_rating import st_star_rating
+from transcript import Transcript
+from usage import StreamUsage, estimate_tokens
+from turn_pipeline import start_turn, submit_background
 
-# Load Config
-with open("../config.yaml", "r") as file:
-    config = yaml.safe_load(file)
+config = get_settings()
 
 
-tokenizer = tiktoken.get_encoding("o200k_base")
-
-SONNET_INPUT_COST_PER_TOKEN = 0.000003
-SONNET_OUTPUT_COST_PER_TOKEN = 0.000015
-HAIKU_INPUT_COST_PER_TOKEN = 0.00000025
-HAIKU_OUTPUT_COST_PER_TOKEN = 0.00000125
+flag_config = config.section("flag_raiser")
+control_config = config.section("control_signals")
+guide_config = config.section("step_guides")
+condensed_config = config.section("condensed_passage")
 
 helpdesk_list = [
     "IT Helpdesk",
@@ -52,7 +64,7 @@ def sessionStateInit():
         st.session_state.humanRedirectThreshold = 2
 
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = Transcript(estimate_tokens)
 
     if "user_question" not in st.session_state:
         st.session_state.user_question = []
@@ -141,34 +153,17 @@ def sessionStateInit():
     if "diagnoseMode" not in st.session_state:
         st.session_state.diagnoseMode = False
 
-    if "input_tokens" not in st.session_state:
-        st.session_state.input_tokens = 0
-
-    if "output_tokens" not in st.session_state:
-        st.session_state.output_tokens = 0
-
-    if "total_cost" not in st.session_state:
-        st.session_state.total_cost = 0
-
-    if "inputSummaryTokens" not in st.session_state:
-        st.session_state.inputSummaryTokens = 0
+    if "ledger" not in st.session_state:
+        st.session_state.ledger = CostLedger()
 
-    if "outputSummaryTokens" not in st.session_state:
-        st.session_state.outputSummaryTokens = 0
+    if "history" not in st.session_state:
+        st.session_state.history = HistoryWindow()
 
-    if "summaryCost" not in st.session_state:
-        st.session_state.summaryCost = 0
-        # for now summary cost accounts for the (marginal) cost of generating tags
-        # i was just too lazy to make tag generation cost its own thing
+    if "pendingFlags" not in st.session_state:
+        st.session_state.pendingFlags = []
 
-    if "inputFlagTokens" not in st.session_state:
-        st.session_state.inputFlagTokens = 0
-
-    if "outputFlagTokens" not in st.session_state:
-        st.session_state.outputFlagTokens = 0
-
-    if "flagRaiserCost" not in st.session_state:
-        st.session_state.flagRaiserCost = 0
+    if "cannedFills" not in st.session_state:
+        st.session_state.cannedFills = []
 
     if "redirectRequests" not in st.session_state:
         st.session_state.redirectRequests = 0
@@ -205,10 +200,7 @@ def get_feedback():
     )
     st.session_state.feedback = st.text_input("Give me some quick feedback!")
 
-    convo = ""
-    for message in st.session_state.messages:
-        if message["role"] != "Administrator":
-            convo += f"{message} \n"
+    convo = st.session_state.messages.render_roles(skip_roles=("Administrator",))
     if len(st.session_state.pills) == 0:
         st.session_state.pills = generate_tags(st, f"{str(convo)}")
     actualTagList = ast.literal_eval(st.session_state.pills)
@@ -222,10 +214,12 @@ def get_feedback():
     if st.button("Complete"):
         if st.session_state.stars == 5:
             st.balloons()
-        st.write(f"""Selected Category: {selected_category}   \nInput Tokens: {st.session_state.input_tokens}  \nOutput Tokens:
-                    {st.session_state.output_tokens}  \nConversation Total Cost: \${round(st.session_state.total_cost, 4)}  \nFlag Check Input Tokens:
-                    {st.session_state.inputFlagTokens}  \nFlag Check Output Tokens: {st.session_state.outputFlagTokens}  \nFlag Check Total Cost: \${round(st.session_state.flagRaiserCost, 4)}
-                    \nTotal Cost: \${round(st.session_state.total_cost + st.session_state.flagRaiserCost, 4)}""")
+        chatTotals = st.session_state.ledger.totals("chat")
+        flagTotals = st.session_state.ledger.totals("flag")
+        st.write(f"""Selected Category: {selected_category}   \nInput Tokens: {chatTotals["input_tokens"]}  \nOutput Tokens:
+                    {chatTotals["output_tokens"]}  \nConversation Total Cost: \${round(chatTotals["cost"], 4)}  \nFlag Check Input Tokens:
+                    {flagTotals["input_tokens"]}  \nFlag Check Output Tokens: {flagTotals["output_tokens"]}  \nFlag Check Total Cost: \${round(flagTotals["cost"], 4)}
+                    \nTotal Cost: \${round(st.session_state.ledger.total_cost(), 4)}""")
         with st.spinner("Generating Summary..."):
             summary = generate_summary(
                 st,
@@ -235,8 +229,9 @@ def get_feedback():
         save_results(st)
 
 
-def filter_and_write_message(prompt):
-    if profanity_check(prompt):
+def filter_and_write_message(prompt, pipeline=None):
+    profane = pipeline.is_profane() if pipeline else profanity_check(prompt)
+    if profane:
         prompt = "The user has entered profanity."
     chat = {"role": "user", "content": prompt}
     st.session_state.messages.append(chat)
@@ -246,36 +241,6 @@ def filter_and_write_message(prompt):
         st.markdown(prompt)
 
 
-def filter_docs(results, min_score=0.7, relative_threshold=0.1):
-    # Filter out documents below the absolute score threshold
-    filtered_results = [
-        result for result in results if result["_score"] >= min_score
-    ]
-
-    # If no documents pass the absolute score threshold, return an empty list
-    if not filtered_results:
-        return []
-
-    # Sort results by score in descending order (already sorted in your case, but for safety)
-    filtered_results.sort(key=lambda x: x["_score"], reverse=True)
-
-    # Apply relative threshold filtering
-    final_results = [
-        filtered_results[0]
-    ]  # Start with the highest score document
-    for i in range(1, len(filtered_results)):
-        current_score = filtered_results[i]["_score"]
-        previous_score = final_results[-1]["_score"]
-
-        # Keep the document if the score drop is within the relative threshold
-        if previous_score - current_score <= relative_threshold:
-            final_results.append(filtered_results[i])
-        else:
-            break  # Stop when the score drop exceeds the threshold
-
-    return final_results
-
-
 def setDiagnoseMode():
     st.session_state.diagnoseMode = True
     st.session_state.first_interaction = True
@@ -287,32 +252,56 @@ def noSimilarIssues():
     st.rerun()
 
 
+def selectIssue(issue):
+    """
+    Search hits only carry the title fields; fetch the passage, guide and
+    condensed passage for the issue that was picked. An article removed
+    since the search sends the user back to describe the issue again.
+    Returns True when the issue was selected.
+    """
+    article = load_article(issue)
+    if article is None:
+        forget_document(issue["_id"])
+        st.session_state.selectedIssue = {}
+        st.session_state.issueFound = False
+        st.session_state.chooseStepStyleMode = False
+        st.session_state.first_interaction = False
+        st.toast(
+            "That help desk article is no longer available. Please describe your issue again.",
+            icon="⚠️",
+        )
+        return False
+    st.session_state.selectedIssue = article
+    return True
+
+
 def diagnoseIssue(issue):
-    st.session_state.selectedIssue = issue
+    selectIssue(issue)
 
 
 def diagnoseIssueRerun(issue):
-    st.session_state.selectedIssue = issue
+    selectIssue(issue)
     st.rerun()
 
 
-def findRelevantIssue(prompt):
-    embedding = embed(prompt)
-    selectedDocs = getSimilarDocs(prompt, embedding)
-    if len(selectedDocs) == 0:
-        noSimilarIssues()
-        return
+def findRelevantIssue(prompt, pipeline=None):
+    if pipeline:
+        selectedDocs, drops = pipeline.similar_docs(prompt)
     else:
-        filteredIssues = filter_docs(selectedDocs)
-    if len(filteredIssues) == 0:
+        selectedDocs, drops = getSimilarDocs(prompt)
+    # getSimilarDocs has already applied the score thresholds (see postprocess.py).
+    # Outcomes are counted here, where they are shown; speculative lookups
+    # that get discarded never reach this point.
+    get_postprocess_stats().record(len(selectedDocs), drops)
+    if len(selectedDocs) == 0:
         noSimilarIssues()
         return
-    elif len(filteredIssues) == 1:
-        diagnoseIssueRerun(filteredIssues[0])
+    elif len(selectedDocs) == 1:
+        diagnoseIssueRerun(selectedDocs[0])
         return
     else:
         st.write("Select the issue that most closely matches your query.")
-        for idx, result in enumerate(filteredIssues):
+        for idx, result in enumerate(selectedDocs):
             st.button(
                 f"Title: {result['_source']['guide_title']}, Score: {result['_score']}",
                 key=f"issue_button_{idx}",
@@ -321,81 +310,219 @@ def findRelevantIssue(prompt):
             )
 
 
-def invokeModel(prompt, st, extraInstructions=""):
-    bedrock_session = boto3.session.Session()
-    client = bedrock_session.client(
-        "bedrock-runtime", region_name=config["region"]
-    )
-    model_id = config["model"]["chat"]
-
-    chatHistory = ""
-    for m in st.session_state.messages:
-        chatHistory += f"{m['role']} : {m['content']}\n"
-
-    adminContent = [
-        {
-            "type": "text",
-            "text": f"{extraInstructions} \n Chat History: {chatHistory}",
-        }
-    ]
-    userContent = [{"type": "text", "text": f"{prompt}"}]
-
-    native_request = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 1000,
-        "temperature": 0.7,
-        "amazon-bedrock-guardrailConfig": {
-            "streamProcessingMode": "ASYNCHRONOUS"
-        },
-        "messages": [
-            {
-                "role": "user",
-                "content": f"Administrator: {adminContent} User: {userContent} Assistant:",
-            },
-        ],
-    }
+def applySignals(signals):
+    """
+    Apply the end-of-turn signals (human/redirect request, resolution,
+    inappropriate content) to the session.
+    Returns True when the conversation changed mode and the page must rerun.
+    """
+    if signals["inappropriate"]:
+        st.toast("Please refrain from profanity usage", icon="👮")
+
+    if signals["issue_resolved"]:
+        st.session_state.diagnoseMode = False
+        st.session_state.issueResolved = True
+        st.session_state.first_interaction = False
+        return True
+
+    if signals["human_request"]:
+        st.session_state.redirectRequests += 1
+        # Below the threshold the request is only counted; the conversation goes on
+        if (
+            st.session_state.redirectRequests
+            < st.session_state.humanRedirectThreshold
+        ):
+            return False
+        st.session_state.diagnoseMode = False
+        st.session_state.humanRedirect = True
+        st.session_state.first_interaction = False
+        return True
+
+    if signals["redirect_request"]:
+        st.session_state.diagnoseMode = False
+        st.session_state.humanRedirect = True
+        st.session_state.first_interaction = False
+        return True
+
+    return False
+
+
+def applyFlag(flag):
+    """
+    Apply one flagRaiser result to the session. See applySignals.
+    """
+    get_logger(__name__).debug(f"Flag: {flag}")
+    return applySignals(signals_from_flag(flag))
+
+
+def applyPendingFlags(wait=False):
+    """
+    Apply background flag checks strictly in the order their turns happened.
+    Without wait, stops at the first check still in flight so a later result
+    can never overtake an earlier one. With wait, blocks until all are applied.
+    Returns True if any flag changed the conversation mode.
+    """
+    changed = False
+    pending = st.session_state.pendingFlags
+    while pending:
+        if not wait and not pending[0].done():
+            break
+        future = pending.pop(0)
+        try:
+            flag, usage = future.result()
+        except Exception as e:
+            get_logger(__name__).warning(f"Flag check failed: {e}")
+            continue
+        record_flag_usage(st, usage)
+        changed = applyFlag(flag) or changed
+    return changed
+
+
+def settlePendingFlags():
+    # A new message must see every earlier turn's flags first. Only a flag
+    # that changed the conversation mode reruns into the new mode (dropping
+    # the message); anything else lets the message through.
+    if applyPendingFlags(wait=True):
+        st.rerun()
 
-    request = json.dumps(native_request)
-    tokens = len(tokenizer.encode(request))
-    st.session_state.input_tokens += tokens
 
-    streaming_response = client.invoke_model_with_response_stream(
-        modelId=model_id,
-        body=request,
-        guardrailIdentifier=config["guardrail_id"],
-        guardrailVersion=config["guardrail_version"],
+@st.fragment(run_every=flag_config.get("poll_seconds", 1))
+def flagPoller():
+    # Apply flags as soon as they land. The page reruns only when a flag
+    # changes the conversation mode (resolved, or a redirect that reached its
+    # threshold); "NA" results and human requests below the threshold are
+    # applied without a redraw.
+    # main renders this fragment only while flags are pending, but its timer
+    # keeps firing until the next full run, so an empty queue returns at once.
+    if not st.session_state.pendingFlags:
+        return
+    if applyPendingFlags():
+        st.rerun(scope="app")
+
+
+def invokeModel(
+    prompt,
+    st,
+    extraInstructions="",
+    pipeline=None,
+    passage=None,
+    canned=False,
+    storedReply=None,
+):
+    """
+    :param canned: The turn is a fixed opening turn (greeting, step-style
+                   question) whose reply may come from the canned turn pool.
+    :param storedReply: A ready {"text", "signals"} reply to stream instead
+                        of calling the model.
+    """
+    client = get_bedrock_client()
+    model_id = config.model.chat
+
+    useControlBlock = control_config.get("enabled", True)
+    staticPrefix = CONTROL_INSTRUCTIONS if useControlBlock else None
+
+    variant = storedReply
+    if variant is None and canned and config.section("canned_turns", DEFAULT_CANNED_SETTINGS)["enabled"]:
+        turnCache = get_turn_cache()
+        cannedKey = turnCache.key(
+            extraInstructions,
+            prompt,
+            st.session_state.currentHelpdesk,
+            model_id,
+            staticPrefix,
+        )
+        variant = turnCache.get(cannedKey)
+        fill = turnCache.refresh(cannedKey, extraInstructions, prompt, staticPrefix)
+        if fill is not None:
+            st.session_state.cannedFills.append(fill)
+
+    # Background pool fills are billed to the session that started them
+    st.session_state.cannedFills = record_fills(
+        st.session_state.cannedFills, st.session_state.ledger
     )
 
-    # Generator function to yield text chunks for `st.write_stream`
-    def generate_response():
-        full_response = ""
-        show_text = True
+    turn = {"signals": None, "usage": StreamUsage()}
+
+    def stream_live():
+        # Only the recent turns go in verbatim; older ones arrive as a summary
+        summary, start = st.session_state.history.prepare(
+            st.session_state.messages, st.session_state.ledger
+        )
+
+        # System blocks (control instructions, mode prompt, passage) are cached
+        # prefixes; the conversation goes in as alternating messages.
+        native_request = build_chat_request(
+            st.session_state.messages,
+            prompt,
+            extraInstructions,
+            passage,
+            static_prefix=staticPrefix,
+            summary=summary,
+            start=start,
+        )
+        turn["summary"] = summary
+        request = json.dumps(native_request)
+
+        streaming_response = client.invoke_model_with_response_stream(
+            modelId=model_id,
+            body=request,
+            guardrailIdentifier=config.guardrail_id,
+            guardrailVersion=config.guardrail_version,
+        )
+
+        parser = ControlStreamParser() if useControlBlock else None
         for event in streaming_response["body"]:
             chunk = json.loads(event["chunk"]["bytes"].decode("utf-8"))
+            turn["usage"].observe(chunk)
             if chunk["type"] == "content_block_delta":
                 text_delta = chunk["delta"].get("text", "")
-                full_response += text_delta
+                if parser:
+                    # The trailing control block is captured, never shown
+                    text_delta = parser.feed(text_delta)
+                yield text_delta
+
+        if parser:
+            yield parser.finish()
+            turn["signals"] = parser.signals
+            if turn["signals"] is None:
+                get_logger(__name__).info("Control block missing or malformed, falling back")
+
+        # Recorded before any signal handling below can rerun the page
+        st.session_state.ledger.record(model_id, "chat", turn["usage"])
+
+    def stream_canned():
+        turn["signals"] = variant["signals"]
+        turn["summary"] = ""
+        yield from replay(variant["text"])
 
-                if show_text:
-                    yield text_delta  # Yielding for streaming
+    # Generator function to yield text chunks for `st.write_stream`
+    def generate_response():
+        full_response = ""
+        for text_delta in stream_canned() if variant else stream_live():
+            full_response += text_delta
+            if text_delta:
+                yield text_delta  # Yielding for streaming
+
+        if useControlBlock or variant:
+            full_response = full_response.rstrip()
 
         chat = {"role": "assistant", "content": full_response}
         st.session_state.messages.append(chat)
         log_chat(chat)
 
-        if "Identified the issue -" in full_response:
+        signals = turn["signals"] or signals_from_text(full_response)
+
+        if signals["issue_identified"]:
             st.session_state.issueFound = True
             st.session_state.first_interaction = True
             st.session_state.chooseStepStyleMode = True
-            findRelevantIssue(prompt)
-
-        if "Got it - multiple steps." in full_response:
-            st.session_state.stepStyle = "m"
-            st.session_state.chooseStepStyleMode = False
-            setDiagnoseMode()
+            findRelevantIssue(prompt, pipeline)
+        elif pipeline:
+            # No issue identified this turn, so the speculative lookup is unused
+            pipeline.discard()
 
-        if "Got it - comprehensive guide." in full_response:
-            st.session_state.stepStyle = "g"
+        if signals["step_style"]:
+            st.session_state.stepStyle = signals["step_style"]
             st.session_state.chooseStepStyleMode = False
             setDiagnoseMode()
 
@@ -403,45 +530,22 @@ def invokeModel(prompt, st, extraInstructions=""):
         st.write_stream(generate_response())
 
     fullResponse = st.session_state.messages[-1]["content"]
-    s = True
-    if s:  # originally was if st.session_state.diagnoseMode:
-        flag = flagRaiser(prompt, fullResponse, st)
-        print(f"\n{flag=}")
-
-        if "innapropriate" in flag:
-            st.toast("Please refrain from profanity usage", icon="👮")
-
-        if "Issue Resolved" in flag:
-            st.session_state.diagnoseMode = False
-            st.session_state.issueResolved = True
-            st.session_state.first_interaction = False
-            st.rerun()
-
-        if "Human request" in flag:
-            st.session_state.redirectRequests += 1
-            if (
-                st.session_state.redirectRequests
-                >= st.session_state.humanRedirectThreshold
-            ):
-                st.session_state.diagnoseMode = False
-                st.session_state.humanRedirect = True
-                st.session_state.first_interaction = False
+    if turn["signals"] is not None:
+        get_logger(__name__).debug(f"Signals: {turn['signals']}")
+        if applySignals(turn["signals"]):
             st.rerun()
-
-        if "Redirect request" in flag:
-            st.session_state.diagnoseMode = False
-            st.session_state.humanRedirect = True
-            st.session_state.first_interaction = False
+    elif control_config.get("fallback_flag_raiser", True):
+        # No usable control block: ask the separate classifier instead
+        if flag_config.get("background", True):
+            # Classified off the critical path; applied in order by applyPendingFlags
+            st.session_state.pendingFlags.append(
+                submit_background(
+                    classify_flags, prompt, fullResponse, turn["summary"]
+                )
+            )
+        elif applyFlag(flagRaiser(prompt, fullResponse, st, turn["summary"])):
             st.rerun()
 
-    tokens = len(tokenizer.encode(fullResponse))
-    st.session_state.output_tokens += tokens
-
-    st.session_state.total_cost += (
-        st.session_state.input_tokens * SONNET_INPUT_COST_PER_TOKEN
-        + st.session_state.output_tokens * SONNET_OUTPUT_COST_PER_TOKEN
-    )
-
 
 def main():
     # hide top bar
@@ -463,6 +567,7 @@ def main():
 
     st.title("USDA Help Desk Chatbot")
     sessionStateInit()
+    applyPendingFlags()
     if st.session_state.stepStyle != "":
         if st.session_state.stepStyle == "g":
             st.session_state.issueSolvePrompt = (
@@ -492,7 +597,31 @@ def main():
         st.write("   \n")
 
         st.write(
-            f"Total Conversation Cost: {round(st.session_state.total_cost, 4)}"
+            f"Total Conversation Cost: {round(st.session_state.ledger.total_cost(), 4)}"
+        )
+        st.write(
+            f"Conversation History Tokens: {st.session_state.messages.total_tokens}"
+        )
+        st.write(
+            f"Summarized Messages: {st.session_state.history.summarized_upto}"
+        )
+        chatTotals = st.session_state.ledger.totals("chat")
+        st.write(
+            f"Prompt Cache Read/Write Tokens: {chatTotals['cache_read_tokens']} / {chatTotals['cache_write_tokens']}"
+        )
+        retrieval = retrieval_stats()
+        st.write(
+            f"Search Cache Hit Rate (exact/semantic): {retrieval['result_cache'].get('hit_rate', 0):.0%} / {retrieval['semantic_cache'].get('hit_rate', 0):.0%}"
+        )
+        st.write(
+            f"Embedding Cache Hit Rate: {retrieval['embedding_cache'].get('hit_rate', 0):.0%}"
+        )
+        searchLatency = retrieval['search'].get('all') or {}
+        st.write(
+            f"OpenSearch Latency p50/p95: {searchLatency.get('p50_ms', 0):.0f} / {searchLatency.get('p95_ms', 0):.0f} ms"
+        )
+        st.write(
+            f"Bedrock Requests on Reused Connections: {retrieval['bedrock']['reused_connections']} / {retrieval['bedrock']['requests']}"
         )
         st.write("   \n")
         st.write("   \n")
@@ -546,11 +675,7 @@ def main():
                 st.markdown(message["content"])
 
     if (
-        (
-            st.session_state.total_cost
-            + st.session_state.summaryCost
-            + st.session_state.flagRaiserCost
-        )
+        st.session_state.ledger.total_cost()
         >= st.session_state.warningThreshold
     ) and not (st.session_state.costWarningHappened):
         st.toast(
@@ -560,11 +685,7 @@ def main():
         st.session_state.costWarningHappened = True
 
     if (
-        (
-            st.session_state.total_cost
-            + st.session_state.summaryCost
-            + st.session_state.flagRaiserCost
-        )
+        st.session_state.ledger.total_cost()
         >= st.session_state.terminateThreshold
     ) and not (st.session_state.humanRedirect):
         st.session_state.tooHighCost = True
@@ -579,11 +700,28 @@ def main():
         if st.session_state.diagnoseMode:
             simulated_user_input = "Let's get started."
             if st.session_state.selectedIssue != {}:
-                passage = st.session_state.selectedIssue["_source"]["passage"]
+                source = st.session_state.selectedIssue["_source"]
+                passage = chat_passage(
+                    source, condensed_config.get("enabled", True)
+                )
+                storedReply = None
+                if st.session_state.stepStyle == "g" and guide_config.get(
+                    "enabled", True
+                ):
+                    # Replay the guide written at ingestion; None (missing
+                    # or stale) falls back to generating it live
+                    guide = stored_guide(source, guide_config.get("version", 1))
+                    if guide:
+                        storedReply = {
+                            "text": guide,
+                            "signals": dict(SIGNAL_DEFAULTS),
+                        }
                 invokeModel(
                     simulated_user_input,
                     st,
-                    f"{st.session_state.issueSolvePrompt} [{passage}]",
+                    st.session_state.issueSolvePrompt,
+                    passage=passage,
+                    storedReply=storedReply,
                 )
             else:
                 passage = "No Issue selected. Try re-entering the prompt and selecting an issue."
@@ -599,7 +737,10 @@ def main():
             st.session_state.user_question = st.session_state.messages
             simulated_user_input = "Ok"
             invokeModel(
-                simulated_user_input, st, st.session_state.chooseStepStylePrompt
+                simulated_user_input,
+                st,
+                st.session_state.chooseStepStylePrompt,
+                canned=True,
             )
             st.session_state.messages.append(
                 {
@@ -609,7 +750,10 @@ def main():
             )
         else:
             invokeModel(
-                simulated_user_input, st, st.session_state.startingPrompt
+                simulated_user_input,
+                st,
+                st.session_state.startingPrompt,
+                canned=True,
             )
             st.session_state.messages.append(
                 {
@@ -620,6 +764,7 @@ def main():
 
     if st.session_state.chooseStepStyleMode:
         if prompt := st.chat_input("Choose a step style."):
+            settlePendingFlags()
             filter_and_write_message(prompt)
             invokeModel(prompt, st)
 
@@ -627,9 +772,15 @@ def main():
         if prompt := st.chat_input(
             f"How can I help you with your issue: {st.session_state.selectedIssue['_source']['guide_title']}?"
         ):
+            settlePendingFlags()
             filter_and_write_message(prompt)
-            passage = st.session_state.selectedIssue["_source"]["passage"]
-            invokeModel(prompt, st, f"[{passage}]")
+            passage = chat_passage(
+                st.session_state.selectedIssue["_source"],
+                condensed_config.get("enabled", True),
+            )
+            invokeModel(
+                prompt, st, st.session_state.issueSolvePrompt, passage=passage
+            )
 
     elif st.session_state.issueResolved:
         get_feedback()
@@ -647,26 +798,35 @@ def main():
             documents found. Redirecting you to a help desk associate.""")
     else:
         if prompt := st.chat_input("How can I help you today?"):
-            filter_and_write_message(prompt)
+            settlePendingFlags()
+            # Guardrail, redirect decision and a speculative issue lookup
+            # all start now and run while the earlier steps are awaited.
+            pipeline = start_turn(
+                prompt,
+                st.session_state.currentHelpdesk,
+                helpdesk_info,
+                redirect=not st.session_state.selectedIssue,
+            )
+            filter_and_write_message(prompt, pipeline)
 
             if not st.session_state.selectedIssue:
-                st.session_state.input_tokens += len(tokenizer.encode(prompt))
-
-                redirect_info = decide_redirect(
-                    prompt, st.session_state.currentHelpdesk, helpdesk_info
+                if pipeline:
+                    redirect_info, redirect_usage = pipeline.redirect_info()
+                else:
+                    redirect_info, redirect_usage = decide_redirect(
+                        prompt, st.session_state.currentHelpdesk, helpdesk_info
+                    )
+                st.session_state.ledger.record(
+                    config.model.redirect, "redirect", redirect_usage
                 )
                 try:
                     helpdesk = re.search(
                         r"<helpdesk>(.*?)</helpdesk>", redirect_info
                     ).group(1)
                 except:
-                    print("No redirect found")
+                    get_logger(__name__).info("No redirect found")
                     helpdesk = st.session_state.currentHelpdesk
 
-                st.session_state.output_tokens += len(
-                    tokenizer.encode(redirect_info)
-                )
-
                 if (
                     helpdesk in helpdesk_list
                     and helpdesk != st.session_state.currentHelpdesk
@@ -677,8 +837,15 @@ def main():
 
                     with st.chat_message("assistant"):
                         st.write(f"Redirecting to the {helpdesk}. {reasoning}")
+                    if pipeline:
+                        pipeline.discard()
                 else:
-                    invokeModel(prompt, st)
+                    invokeModel(prompt, st, pipeline=pipeline)
+            elif pipeline:
+                pipeline.discard()
+
+    if st.session_state.pendingFlags:
+        flagPoller()
 
 
 if __name__ == "__main__":
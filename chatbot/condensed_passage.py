@@ -0,0 +1,54 @@
+# Compact, structured form of a knowledge article, built at ingestion time and
+# sent to the chat model instead of the raw passage.
+CONDENSED_FIELD = "condensed_passage"
+TOKENS_FIELD = "condensed_tokens"
+PREREQUISITES_FIELD = "prerequisites"
+KEY_FACTS_FIELD = "key_facts"
+
+
+def _approx_tokens(text):
+    # Same ~4 characters per token heuristic as usage.estimate_tokens
+    return (len(text) + 3) // 4
+
+
+def condense(title, steps, prerequisites=(), key_facts=()):
+    """
+    Render the article as title, prerequisites, numbered steps and key facts.
+    """
+    lines = [f"Article: {title}"]
+    if prerequisites:
+        lines.append("Prerequisites:")
+        lines.extend(f"- {item}" for item in prerequisites)
+    if steps:
+        lines.append("Steps:")
+        lines.extend(f"{number}. {step}" for number, step in enumerate(steps, start=1))
+    if key_facts:
+        lines.append("Key facts:")
+        lines.extend(f"- {fact}" for fact in key_facts)
+    return "\n".join(lines)
+
+
+def condensed_fields(title, steps, prerequisites=(), key_facts=(), count_tokens=_approx_tokens):
+    """
+    :return: The index fields for the condensed form, or {} when the article
+             has no steps (the raw passage is used for those).
+    """
+    if not steps:
+        return {}
+    condensed = condense(title, steps, prerequisites, key_facts)
+    return {
+        CONDENSED_FIELD: condensed,
+        TOKENS_FIELD: count_tokens(condensed),
+        PREREQUISITES_FIELD: list(prerequisites),
+        KEY_FACTS_FIELD: list(key_facts),
+    }
+
+
+def chat_passage(source, use_condensed=True):
+    """
+    :param source: The article's `_source` from OpenSearch.
+    :return: The text to send to the chat model for this article.
+    """
+    if use_condensed and source.get(CONDENSED_FIELD):
+        return source[CONDENSED_FIELD]
+    return source["passage"]
@@ -0,0 +1,136 @@
+import json
+
+OPEN_TAG = "<control>"
+CLOSE_TAG = "</control>"
+
+SIGNAL_DEFAULTS = {
+    "issue_identified": False,
+    "step_style": None,
+    "human_request": False,
+    "redirect_request": False,
+    "issue_resolved": False,
+    "inappropriate": False,
+}
+
+STEP_STYLES = {"multiple": "m", "guide": "g"}
+
+CONTROL_INSTRUCTIONS = f"""
+Control block:
+After your reply, always end with one control block on its own line, exactly in this form and with nothing after it:
+{OPEN_TAG}{{"issue_identified": false, "step_style": null, "human_request": false, "redirect_request": false, "issue_resolved": false, "inappropriate": false}}{CLOSE_TAG}
+The user never sees this block. Set the fields as follows:
+- "issue_identified": true only if your reply says "Identified the issue - ...".
+- "step_style": "multiple" if your reply says "Got it - multiple steps.", "guide" if it says "Got it - comprehensive guide.", otherwise null.
+- "human_request": true if the user's latest message explicitly asks to speak to a human.
+- "redirect_request": true if the user's latest message or your reply means you cannot assist the user any further.
+- "issue_resolved": true only if the user's latest message or your reply explicitly says the entire issue is resolved and there are no more steps.
+- "inappropriate": true if the user's latest message or your reply contains profanity or personally identifiable information.
+"""
+
+
+def parse_control_block(raw):
+    """
+    Parse the JSON inside a control block.
+    :return: Dict with every key of SIGNAL_DEFAULTS, or None if the block is malformed.
+    """
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    signals = dict(SIGNAL_DEFAULTS)
+    for key, default in SIGNAL_DEFAULTS.items():
+        value = data.get(key, default)
+        if key == "step_style":
+            if value is not None and value not in STEP_STYLES:
+                return None
+            signals[key] = STEP_STYLES.get(value)
+        elif isinstance(value, bool):
+            signals[key] = value
+        else:
+            return None
+    return signals
+
+
+class ControlStreamParser:
+    """
+    Splits a streamed reply into the text shown to the user and the trailing
+    control block. feed() returns only text that can safely be displayed,
+    holding back anything that might be the start of the opening tag.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._block = None
+        self.raw = None
+
+    def feed(self, text):
+        if self._block is not None:
+            self._block += text
+            self._close()
+            return ""
+
+        self._pending += text
+        start = self._pending.find(OPEN_TAG)
+        if start != -1:
+            visible = self._pending[:start]
+            self._block = self._pending[start + len(OPEN_TAG):]
+            self._pending = ""
+            self._close()
+            return visible
+
+        hold = 0
+        for size in range(min(len(OPEN_TAG) - 1, len(self._pending)), 0, -1):
+            if self._pending.endswith(OPEN_TAG[:size]):
+                hold = size
+                break
+        visible = self._pending[:len(self._pending) - hold]
+        self._pending = self._pending[len(self._pending) - hold:]
+        return visible
+
+    def _close(self):
+        if self.raw is None and CLOSE_TAG in self._block:
+            self.raw = self._block[:self._block.index(CLOSE_TAG)]
+
+    def finish(self):
+        """
+        :return: Any held-back text that turned out not to be a control block.
+        """
+        visible, self._pending = self._pending, ""
+        return visible
+
+    @property
+    def signals(self):
+        """
+        :return: Parsed signals, or None when the block was missing, unterminated or malformed.
+        """
+        if self.raw is None:
+            return None
+        return parse_control_block(self.raw)
+
+
+def signals_from_text(full_response):
+    """
+    Legacy detection from the verbatim phrases in the prompts.
+    """
+    signals = dict(SIGNAL_DEFAULTS)
+    signals["issue_identified"] = "Identified the issue -" in full_response
+    if "Got it - multiple steps." in full_response:
+        signals["step_style"] = "m"
+    elif "Got it - comprehensive guide." in full_response:
+        signals["step_style"] = "g"
+    return signals
+
+
+def signals_from_flag(flag):
+    """
+    Translate a flagRaiser response (e.g. "NA;innapropriate") into signals.
+    """
+    signals = dict(SIGNAL_DEFAULTS)
+    signals["human_request"] = "Human request" in flag
+    signals["redirect_request"] = "Redirect request" in flag
+    signals["issue_resolved"] = "Issue Resolved" in flag
+    signals["inappropriate"] = "innapropriate" in flag
+    return signals
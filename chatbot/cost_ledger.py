@@ -0,0 +1,125 @@
+from datetime import datetime
+
+from resources import shared_resource
+from settings import get_settings
+
+# USD per million tokens; the `pricing` section of config.yaml overrides these.
+# Prompt-cache rates default to CACHE_READ_RATE / CACHE_WRITE_RATE times the
+# input price unless a model sets cache_read / cache_write explicitly.
+DEFAULT_PRICES = {
+    "anthropic.claude-3-5-sonnet-20241022-v2:0": {"input": 3.00, "output": 15.00},
+    "anthropic.claude-3-sonnet-20240229-v1:0": {"input": 3.00, "output": 15.00},
+    "anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.25, "output": 1.25},
+    "amazon.titan-embed-text-v2:0": {"input": 0.02, "output": 0.00},
+}
+
+CACHE_READ_RATE = 0.1
+CACHE_WRITE_RATE = 1.25
+
+_warned_models = set()
+
+
+@shared_resource
+def price_table():
+    prices = {model_id: dict(price) for model_id, price in DEFAULT_PRICES.items()}
+    for model_id, price in get_settings().section('pricing').items():
+        prices.setdefault(model_id, {"input": 0.0, "output": 0.0}).update(price)
+    for price in prices.values():
+        price.setdefault("cache_read", price["input"] * CACHE_READ_RATE)
+        price.setdefault("cache_write", price["input"] * CACHE_WRITE_RATE)
+    return prices
+
+
+def call_cost(model_id, input_tokens, output_tokens, cache_read_tokens=0, cache_write_tokens=0):
+    """
+    :return: USD cost of one call, from the price table.
+    """
+    price = price_table().get(model_id)
+    if price is None:
+        if model_id not in _warned_models:
+            _warned_models.add(model_id)
+            # Imported here: logging_config imports this module
+            from logging_config import get_logger
+            get_logger(__name__).warning(f"No price configured for {model_id}, counting its calls as $0")
+        return 0.0
+    return (
+        input_tokens * price["input"]
+        + output_tokens * price["output"]
+        + cache_read_tokens * price["cache_read"]
+        + cache_write_tokens * price["cache_write"]
+    ) / 1_000_000
+
+
+class CostLedger:
+    """
+    One row per model call in a conversation, plus running per-phase totals
+    so the sidebar and threshold checks never rescan the rows.
+    """
+
+    FIELDS = [
+        "time", "model_id", "phase", "input_tokens", "output_tokens",
+        "cache_read_tokens", "cache_write_tokens", "latency_ms", "cost",
+    ]
+
+    def __init__(self):
+        self.rows = []
+        self._totals = {}
+        self._all = self._empty_totals()
+
+    @staticmethod
+    def _empty_totals():
+        return {
+            "calls": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_tokens": 0,
+            "cache_write_tokens": 0,
+            "cost": 0.0,
+        }
+
+    def record(self, model_id, phase, usage, latency_ms=None):
+        """
+        Record one call.
+        :param usage: The Usage Bedrock reported for the call.
+        :param latency_ms: Measured latency, if usage does not carry it.
+        :return: The new row.
+        """
+        if latency_ms is None:
+            latency_ms = usage.latency_ms
+        row = {
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "model_id": model_id,
+            "phase": phase,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_read_tokens": usage.cache_read_tokens,
+            "cache_write_tokens": usage.cache_write_tokens,
+            "latency_ms": latency_ms,
+            "cost": call_cost(
+                model_id,
+                usage.input_tokens,
+                usage.output_tokens,
+                usage.cache_read_tokens,
+                usage.cache_write_tokens,
+            ),
+        }
+        self.rows.append(row)
+
+        for totals in (self._totals.setdefault(phase, self._empty_totals()), self._all):
+            totals["calls"] += 1
+            for key in ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens", "cost"):
+                totals[key] += row[key]
+        return row
+
+    def totals(self, phase=None):
+        """
+        :return: Dict of calls, token counts (including cache reads/writes) and cost for one phase, or all calls.
+        """
+        if phase is None:
+            return dict(self._all)
+        return dict(self._totals.get(phase) or self._empty_totals())
+
+    def total_cost(self, phase=None):
+        if phase is None:
+            return self._all["cost"]
+        return (self._totals.get(phase) or self._empty_totals())["cost"]
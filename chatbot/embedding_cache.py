@@ -0,0 +1,164 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_text(text):
+    """
+    Collapse whitespace and case so trivially different inputs share a cache entry.
+    """
+    return " ".join(text.split()).casefold()
+
+
+def cache_key(text, model_id):
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier memo for embedding vectors.
+    Tier one is an in-process LRU bounded by entry count and TTL. Tier two is an
+    optional SQLite file holding float32 blobs, which survives restarts and is
+    shared by every worker on the host (SQLite handles the cross-process locking).
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=86400, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        self._db = None
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, timeout=10, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model_id TEXT, created REAL, vector BLOB)"
+            )
+            self._db.commit()
+
+    def _expired(self, created):
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _memory_get(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created, vector = entry
+        if self._expired(created):
+            del self._memory[key]
+            self._stats["expirations"] += 1
+            return None
+        self._memory.move_to_end(key)
+        return vector
+
+    def _memory_put(self, key, created, vector):
+        self._memory[key] = (created, vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key):
+        row = self._db.execute(
+            "SELECT created, vector FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        created, blob = row
+        if self._expired(created):
+            self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._db.commit()
+            self._stats["expirations"] += 1
+            return None
+        return created, np.frombuffer(blob, dtype=np.float32)
+
+    def _disk_put(self, key, model_id, created, vector):
+        self._db.execute(
+            "INSERT OR REPLACE INTO embeddings (key, model_id, created, vector) VALUES (?, ?, ?, ?)",
+            (key, model_id, created, vector.tobytes()),
+        )
+        self._db.commit()
+
+    def get(self, text, model_id):
+        """
+        :return: The cached embedding as a list of floats, or None on a miss.
+        """
+        key = cache_key(text, model_id)
+        with self._lock:
+            vector = self._memory_get(key)
+            if vector is not None:
+                self._stats["memory_hits"] += 1
+                return vector.tolist()
+
+            if self._db is not None:
+                found = self._disk_get(key)
+                if found is not None:
+                    created, vector = found
+                    self._memory_put(key, created, vector)
+                    self._stats["disk_hits"] += 1
+                    return vector.tolist()
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, text, model_id, embedding):
+        key = cache_key(text, model_id)
+        vector = np.asarray(embedding, dtype=np.float32)
+        created = time.time()
+        with self._lock:
+            self._memory_put(key, created, vector)
+            if self._db is not None:
+                self._disk_put(key, model_id, created, vector)
+        return vector
+
+    def get_or_compute(self, text, model_id, compute):
+        """
+        Return the cached embedding for (text, model_id), calling compute(text) on a miss.
+        """
+        embedding = self.get(text, model_id)
+        if embedding is None:
+            # Hand back the float32 copy so hits and misses return identical vectors.
+            embedding = self.put(text, model_id, compute(text)).tolist()
+        return embedding
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def cache_from_config(config):
+    """
+    Build an EmbeddingCache from the `embedding_cache` section of config.yaml.
+    :return: The cache, or None when the section is missing or disabled.
+    """
+    settings = config.get('embedding_cache') or {}
+    if not settings.get('enabled', False):
+        return None
+    return EmbeddingCache(
+        max_entries=settings.get('max_entries', 2048),
+        ttl_seconds=settings.get('ttl_seconds', 86400),
+        disk_path=settings.get('disk_path'),
+    )
@@ -0,0 +1,119 @@
+"""
+Hybrid score fusion on NumPy arrays of ids and scores.
+
+Strategies:
+- "interpolate": normalized scores blended with alpha; a document found by
+  only one query keeps that query's normalized score (the original
+  hybrid_search behaviour).
+- "convex": alpha * lexical + (1 - alpha) * semantic, a missing side counting as 0.
+- "rrf": reciprocal rank fusion, sum of 1 / (k + rank) with 1-based ranks.
+
+Ties are broken by first appearance (lexical order, then semantic-only hits
+in semantic order), so the same inputs always give the same ranking.
+"""
+import numpy as np
+
+NORMALIZERS = ("minmax", "zscore", "l2")
+STRATEGIES = ("interpolate", "convex", "rrf")
+
+
+def normalize(scores, method="minmax"):
+    """
+    :param method: "minmax" (all-equal scores map to 1.0), "zscore"
+                   (all-equal scores map to 0.0) or "l2".
+    :return: float64 array of normalized scores.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return scores
+    if method == "minmax":
+        low = scores.min()
+        spread = scores.max() - low
+        if spread == 0:
+            return np.ones_like(scores)
+        return (scores - low) / spread
+    if method == "zscore":
+        std = scores.std()
+        if std == 0:
+            return np.zeros_like(scores)
+        return (scores - scores.mean()) / std
+    if method == "l2":
+        norm = np.linalg.norm(scores)
+        if norm == 0:
+            return np.zeros_like(scores)
+        return scores / norm
+    raise ValueError(f"Unknown normalizer '{method}', expected one of {NORMALIZERS}")
+
+
+def _union(lexical_ids, semantic_ids):
+    """
+    :return: (union ids in first-appearance order, position of each lexical
+             id in the union, position of each semantic id in the union)
+    """
+    # A dict lookup per id beats np.unique here: ids are strings, and
+    # np.unique would sort them and lose the first-appearance order
+    positions = {}
+    lexical_pos = np.fromiter(
+        (positions.setdefault(doc_id, len(positions)) for doc_id in lexical_ids),
+        dtype=np.intp, count=len(lexical_ids),
+    )
+    semantic_pos = np.fromiter(
+        (positions.setdefault(doc_id, len(positions)) for doc_id in semantic_ids),
+        dtype=np.intp, count=len(semantic_ids),
+    )
+    ids = np.empty(len(positions), dtype=object)
+    ids[:] = list(positions)
+    return ids, lexical_pos, semantic_pos
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first, ties broken by lower index.
+    Uses argpartition, so only the k winners are sorted.
+    """
+    n = scores.size
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    if k is None or k >= n:
+        candidates = np.arange(n)
+    else:
+        best = np.argpartition(-scores, k - 1)[:k]
+        # Widen to every index tied with the k-th best score, so the tie-break below decides the cut
+        candidates = np.flatnonzero(scores >= scores[best].min())
+    ordered = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return ordered[:k] if k is not None else ordered
+
+
+def fuse(lexical_ids, lexical_scores, semantic_ids, semantic_scores,
+         strategy="interpolate", normalizer="minmax", alpha=0.5, rrf_k=60, k=None):
+    """
+    Fuse the lexical and semantic hit lists (each ordered best first).
+    :param alpha: Weight of the lexical side for interpolate/convex.
+    :param k: Number of fused hits to return (all when None).
+    :return: (ids, scores) arrays of the fused top-k, best first.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown fusion strategy '{strategy}', expected one of {STRATEGIES}")
+
+    ids, lexical_pos, semantic_pos = _union(lexical_ids, semantic_ids)
+    fused = np.zeros(ids.size, dtype=np.float64)
+
+    if strategy == "rrf":
+        fused[lexical_pos] += 1.0 / (rrf_k + np.arange(1, lexical_pos.size + 1))
+        fused[semantic_pos] += 1.0 / (rrf_k + np.arange(1, semantic_pos.size + 1))
+    else:
+        lexical = np.zeros(ids.size)
+        semantic = np.zeros(ids.size)
+        lexical[lexical_pos] = normalize(lexical_scores, normalizer)
+        semantic[semantic_pos] = normalize(semantic_scores, normalizer)
+        fused = alpha * lexical + (1 - alpha) * semantic
+        if strategy == "interpolate":
+            in_lexical = np.zeros(ids.size, dtype=bool)
+            in_semantic = np.zeros(ids.size, dtype=bool)
+            in_lexical[lexical_pos] = True
+            in_semantic[semantic_pos] = True
+            fused = np.where(in_lexical & ~in_semantic, lexical, fused)
+            fused = np.where(in_semantic & ~in_lexical, semantic, fused)
+
+    winners = top_k(fused, k)
+    return ids[winners], fused[winners]
@@ -0,0 +1,106 @@
+from concurrent.futures import Future
+
+from llm_utils import summarize_history
+from logging_config import get_logger
+from settings import get_settings
+from turn_pipeline import submit_background
+
+DEFAULT_WINDOW_SETTINGS = {
+    "enabled": True,
+    "keep_turns": 4,
+    "token_budget": 3000,
+    "summary_max_tokens": 400,
+    "background": True,
+}
+
+CONVERSATION_ROLES = ("user", "assistant")
+
+
+class HistoryWindow:
+    """
+    Bounds the conversation sent to the model on each turn. The newest
+    keep_turns user/assistant exchanges (within token_budget) are sent
+    verbatim; older messages are folded into a rolling summary written by
+    the `summary` model in the background. Administrator entries are never
+    part of the window: prompt_builder sends only the newest prompt/passage.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or get_settings().section('history_window', DEFAULT_WINDOW_SETTINGS)
+        self.summary = ""
+        # Messages before this transcript index are covered by the summary
+        self.summarized_upto = 0
+        self._pending = None
+
+    def _window_start(self, transcript):
+        keep = 2 * self.settings["keep_turns"]
+        budget = self.settings["token_budget"]
+        start = len(transcript)
+        kept = tokens = 0
+        for index in range(len(transcript) - 1, -1, -1):
+            if transcript[index]["role"] not in CONVERSATION_ROLES:
+                continue
+            message_tokens = transcript.message_tokens(index)
+            # The newest message always goes in, even if it is over budget
+            if kept >= keep or (kept and tokens + message_tokens > budget):
+                break
+            kept += 1
+            tokens += message_tokens
+            start = index
+        return start
+
+    def collect(self, ledger=None):
+        """
+        Apply a finished background summary, recording its cost in ledger.
+        A failed summary is retried on the next fold.
+        """
+        if self._pending is None or not self._pending[0].done():
+            return
+        future, upto = self._pending
+        self._pending = None
+        try:
+            summary, usage = future.result()
+        except Exception as e:
+            get_logger(__name__).warning(f"History summary failed: {e}")
+            return
+        self.summary = summary.strip()
+        self.summarized_upto = upto
+        if ledger is not None:
+            ledger.record(get_settings().model.summary, "history_summary", usage)
+
+    def _fold(self, transcript, upto, ledger):
+        conversation = "".join(
+            transcript.render_message(transcript[index])
+            for index in range(self.summarized_upto, upto)
+            if transcript[index]["role"] in CONVERSATION_ROLES
+        )
+        args = (self.summary, conversation, self.settings["summary_max_tokens"])
+        if self.settings["background"]:
+            self._pending = (submit_background(summarize_history, *args), upto)
+            return
+
+        future = Future()
+        try:
+            future.set_result(summarize_history(*args))
+        except Exception as e:
+            future.set_exception(e)
+        self._pending = (future, upto)
+        self.collect(ledger)
+
+    def prepare(self, transcript, ledger=None):
+        """
+        Pick the part of the transcript to send this turn and start folding
+        anything that has aged out of the window.
+        :return: (summary text, index of the first transcript message to send)
+        """
+        if not self.settings["enabled"]:
+            return "", 0
+
+        self.collect(ledger)
+        start = self._window_start(transcript)
+        if start > self.summarized_upto and self._pending is None:
+            self._fold(transcript, start, ledger)
+
+        # Until the summary catches up, the not-yet-folded messages stay verbatim
+        return self.summary, min(start, self.summarized_upto)
+
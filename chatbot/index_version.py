@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+# The generation number of the article index lives in a side index,
+# `<index>-meta`. Ingestion bumps it after every run that changed the index;
+# the chatbot's retrieval caches drop their entries when it moves.
+# Every bump adds a marker document with a generated id (see BulkWriter in
+# data-ingest on custom ids) and the newest one wins.
+META_MAPPING = {
+    "mappings": {
+        "properties": {
+            "version": {"type": "long"},
+            "updated_at": {"type": "date"},
+        }
+    }
+}
+
+LATEST_VERSION_QUERY = {
+    "size": 1,
+    "sort": [{"version": {"order": "desc"}}],
+    "_source": ["version"],
+    "query": {"match_all": {}},
+}
+
+
+def meta_index(index):
+    return f"{index}-meta"
+
+
+def read_version(client, index):
+    """
+    :return: The current generation of index, 0 if it was never bumped.
+    """
+    # Imported here, like the client itself (see os_client.py)
+    from opensearchpy import NotFoundError
+
+    try:
+        response = client.search(index=meta_index(index), body=LATEST_VERSION_QUERY)
+    except NotFoundError:
+        return 0
+    hits = response["hits"]["hits"]
+    return hits[0]["_source"]["version"] if hits else 0
+
+
+def bump_version(client, index):
+    """
+    Move index to its next generation. The new version is the current time
+    in milliseconds (or one more than the last version, if that is larger),
+    so it moves forward even when a search has not caught up with the
+    previous bump yet.
+    :return: The new version.
+    """
+    meta = meta_index(index)
+    if not client.indices.exists(index=meta):
+        client.indices.create(index=meta, body=META_MAPPING)
+    version = max(read_version(client, index) + 1, int(time.time() * 1000))
+    client.index(
+        index=meta,
+        body={"version": version, "updated_at": datetime.now(timezone.utc).isoformat()},
+    )
+    return version
+
+
+class IndexVersion:
+    """
+    Process-wide view of the index generation. Reads the marker at most once
+    every check_seconds, so cache lookups do not add a round trip each; a
+    failed read keeps the last known version. One thread reads at a time,
+    outside the lock, while the others keep using the last known version.
+    :param get_client: Returns the OpenSearch client; called on the first
+                       read, so building the caches opens no connection.
+    """
+
+    def __init__(self, get_client, index, check_seconds=30):
+        self.get_client = get_client
+        self.index = index
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._first_read = threading.Event()
+        self._refreshing = False
+        self._version = None
+        self._checked = 0.0
+
+    def current(self):
+        with self._lock:
+            fresh = self._version is not None and time.time() - self._checked < self.check_seconds
+            refresh = not fresh and not self._refreshing
+            if refresh:
+                self._refreshing = True
+            version = self._version
+        if fresh or (not refresh and version is not None):
+            return version
+        if not refresh:
+            # Nothing to fall back on before the first read completes
+            self._first_read.wait()
+            return self._version
+
+        try:
+            version = read_version(self.get_client(), self.index)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Could not read the index version: {e}")
+            version = None
+        with self._lock:
+            if version is not None:
+                self._version = version
+            elif self._version is None:
+                self._version = 0
+            self._checked = time.time()
+            self._refreshing = False
+            version = self._version
+        self._first_read.set()
+        return version
@@ -1,26 +1,32 @@
-import boto3
 import json
-import yaml
-import tiktoken
+import time
 import logging
-
-# Load Config
-with open('../config.yaml', 'r') as file:
-    config = yaml.safe_load(file)
-
-SONNET_INPUT_COST_PER_TOKEN = 0.000003
-SONNET_OUTPUT_COST_PER_TOKEN = 0.000015
-HAIKU_INPUT_COST_PER_TOKEN = 0.00000025
-HAIKU_OUTPUT_COST_PER_TOKEN = 0.00000125
-
-tokenizer = tiktoken.get_encoding("o200k_base")
+from bedrock_client import get_bedrock_client
+from settings import get_settings
+from usage import usage_from_body
 
 def log_chat(chat):
     role = chat.get("role", "unknown")
     content = chat.get("content", "")
     logging.info(f"{role}: {content}")
 
+def _invoke(body, model_id):
+    """
+    Call invoke_model and time it.
+    :return: (response text, Usage with latency_ms set)
+    """
+    bedrock = get_bedrock_client()
+    start = time.perf_counter()
+    response = bedrock.invoke_model(body=body, modelId=model_id)
+    response_body = json.loads(response.get("body").read())
+    usage = usage_from_body(response_body)
+    usage.latency_ms = (time.perf_counter() - start) * 1000
+    return response_body.get("content")[0].get("text"), usage
+
 def decide_redirect(conversation, current_helpdesk, helpdesk_info): 
+    """
+    :return: (model response text, Usage)
+    """
     prompt = f"""
     You are to read the above conversation, 
     and decide whether or not the user is on the correct helpdesk.
@@ -38,22 +44,15 @@ def decide_redirect(conversation, current_helpdesk, helpdesk_info):
 
     prompt += conversation
 
-    bedrock_session = boto3.session.Session()
-    bedrock = bedrock_session.client("bedrock-runtime", region_name=config['region'])
-
     body = json.dumps({
     "max_tokens": 1024,
     "messages": [{"role": "user", "content": prompt}],
     "anthropic_version": "bedrock-2023-05-31"
     })
 
-    response = bedrock.invoke_model(body=body, modelId=config['model']['redirect'])
-
-    response_body = json.loads(response.get("body").read())
-    return response_body.get("content")[0].get("text")
-
-def flagRaiser(user_query, lastMessage, st): 
+    return _invoke(body, get_settings().model.redirect)
 
+def _flag_request(user_query, lastMessage, context=""):
     prompt = f"""
     Evaluate the content of the provided messages carefully. 
     Based on the following criteria, respond only with the exact matching string (without any additional text or explanation):
@@ -67,37 +66,41 @@ def flagRaiser(user_query, lastMessage, st):
     System's message to evaluate: {lastMessage}
     """
 
-    bedrock_session = boto3.session.Session()
-    bedrock = bedrock_session.client("bedrock-runtime", region_name=config['region'])
+    if context:
+        prompt += f"""
+    Summary of the earlier conversation, for context only: {context}
+    """
 
-    body = json.dumps({
+    return json.dumps({
     "max_tokens": 1024,
     "messages": [{"role": "user", "content": prompt}],
     "anthropic_version": "bedrock-2023-05-31"
     })
 
-    tokens = len(tokenizer.encode(body))
-    st.session_state.inputFlagTokens += tokens
+def classify_flags(user_query, lastMessage, context=""):
+    """
+    Run the flag classifier without touching session state, so it can run off the script thread.
+    :param context: Optional rolling summary of the earlier conversation.
+    :return: (flag text, Usage)
+    """
+    body = _flag_request(user_query, lastMessage, context)
 
-    response = bedrock.invoke_model(body=body, modelId=config['model']['flag_raiser'])
+    return _invoke(body, get_settings().model.flag_raiser)
 
-    response_body = json.loads(response.get("body").read())
-    text = response_body.get("content")[0].get("text")
-    tokens = len(tokenizer.encode(text))
-    st.session_state.outputFlagTokens += tokens
-    st.session_state.flagRaiserCost += (
-        st.session_state.inputFlagTokens * SONNET_INPUT_COST_PER_TOKEN + 
-        st.session_state.outputFlagTokens * SONNET_OUTPUT_COST_PER_TOKEN
-    )
+def record_flag_usage(st, usage):
+    st.session_state.ledger.record(get_settings().model.flag_raiser, "flag", usage)
+
+def flagRaiser(user_query, lastMessage, st, context=""): 
+    text, usage = classify_flags(user_query, lastMessage, context)
+    record_flag_usage(st, usage)
     return text
 
 def profanity_check(text):
-    bedrock_session = boto3.session.Session()
-    client = bedrock_session.client("bedrock-runtime", region_name=config['region'])
+    client = get_bedrock_client()
 
     response = client.apply_guardrail(
-        guardrailIdentifier=config['guardrail_id'],
-        guardrailVersion=config['guardrail_version'],
+        guardrailIdentifier=get_settings().guardrail_id,
+        guardrailVersion=get_settings().guardrail_version,
         source='INPUT',
         content=[
             {
@@ -124,28 +127,14 @@ def generate_tags(st, document_text):
     in the following format: ['category 1','category 2']
     Here is the conversation: {document_text}
     """
-    bedrock_session = boto3.session.Session()
-    bedrock = bedrock_session.client("bedrock-runtime", region_name=config['region'])
-
     body = json.dumps({
     "max_tokens": 1024,
     "messages": [{"role": "user", "content": prompt}],
     "anthropic_version": "bedrock-2023-05-31"
     })
 
-    tokens = len(tokenizer.encode(body))
-    st.session_state.inputSummaryTokens += tokens
-
-    response = bedrock.invoke_model(body=body, modelId=config['model']['category_generation'])
-
-    response_body = json.loads(response.get("body").read())
-    text = response_body.get("content")[0].get("text")
-    tokens = len(tokenizer.encode(text))
-    st.session_state.outputSummaryTokens += tokens
-    st.session_state.summaryCost += (
-        st.session_state.inputSummaryTokens * HAIKU_INPUT_COST_PER_TOKEN + 
-        st.session_state.outputSummaryTokens * HAIKU_OUTPUT_COST_PER_TOKEN
-    )
+    text, usage = _invoke(body, get_settings().model.category_generation)
+    st.session_state.ledger.record(get_settings().model.category_generation, "tags", usage)
     return text
 
 def generate_summary(st, document_text):
@@ -157,26 +146,38 @@ def generate_summary(st, document_text):
 
     prompt += document_text
 
-    bedrock_session = boto3.session.Session()
-    bedrock = bedrock_session.client("bedrock-runtime", region_name=config['region'])
-
     body = json.dumps({
     "max_tokens": 1024,
     "messages": [{"role": "user", "content": prompt}],
     "anthropic_version": "bedrock-2023-05-31"
     })
 
-    tokens = len(tokenizer.encode(body))
-    st.session_state.inputSummaryTokens += tokens
+    text, usage = _invoke(body, get_settings().model.summary)
+    st.session_state.ledger.record(get_settings().model.summary, "summary", usage)
+    return text
+
+def summarize_history(previous_summary, conversation, max_tokens=400):
+    """
+    Fold older messages into the rolling conversation summary. Touches no
+    session state, so it can run off the script thread.
+    :return: (summary text, Usage)
+    """
+    prompt = f"""
+    You keep a running summary of a help desk conversation so the assistant
+    can continue it without the full history. Update the summary with the new
+    messages below. Keep the user's issue, what has been tried, which steps are
+    done, and anything the user asked to remember. Be concise.
+
+    Current summary: {previous_summary or "None yet."}
 
-    response = bedrock.invoke_model(body=body, modelId=config['model']['summary'])
+    New messages:
+    {conversation}
+    """
 
-    response_body = json.loads(response.get("body").read())
-    text = response_body.get("content")[0].get("text")
-    tokens = len(tokenizer.encode(text))
-    st.session_state.outputSummaryTokens += tokens
-    st.session_state.summaryCost += (
-        st.session_state.inputSummaryTokens * HAIKU_INPUT_COST_PER_TOKEN + 
-        st.session_state.outputSummaryTokens * HAIKU_OUTPUT_COST_PER_TOKEN
-    )
-    return text
\ No newline at end of file
+    body = json.dumps({
+    "max_tokens": max_tokens,
+    "messages": [{"role": "user", "content": prompt}],
+    "anthropic_version": "bedrock-2023-05-31"
+    })
+
+    return _invoke(body, get_settings().model.summary)
@@ -2,30 +2,40 @@ import os
 import logging
 from datetime import datetime   
 import csv
+from cost_ledger import CostLedger
+from resources import shared_resource
 
-# Set up logging
 LOG_FILE = "chat_log.log"
 
-# Create or append to the log file
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w"):
-        pass
-
-logging.basicConfig(
-    filename=LOG_FILE, 
-    level=logging.INFO, 
-    format="%(asctime)s - %(message)s", 
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-logging.getLogger('boto3').setLevel(logging.CRITICAL)
-logging.getLogger('boto3').propagate = False
-logging.getLogger('botocore').setLevel(logging.CRITICAL)
-logging.getLogger('botocore').propagate = False
-logging.getLogger('opensearch').setLevel(logging.CRITICAL)
-logging.getLogger('opensearch').propagate = False
+@shared_resource
+def configure_logging():
+    # Deferred to the first logged message so importing this module never
+    # touches the filesystem. basicConfig creates or appends to the file.
+    logging.basicConfig(
+        filename=LOG_FILE, 
+        level=logging.INFO, 
+        format="%(asctime)s - %(message)s", 
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+    logging.getLogger('boto3').setLevel(logging.CRITICAL)
+    logging.getLogger('boto3').propagate = False
+    logging.getLogger('botocore').setLevel(logging.CRITICAL)
+    logging.getLogger('botocore').propagate = False
+    logging.getLogger('opensearch').setLevel(logging.CRITICAL)
+    logging.getLogger('opensearch').propagate = False
+    return True
+
+def get_logger(name):
+    """
+    Named logger writing to the chat log. Call it where the message is
+    logged, not at import, so logging stays unconfigured until then.
+    """
+    configure_logging()
+    return logging.getLogger(name)
 
 def log_chat(chat):
+    configure_logging()
     role = chat.get("role", "unknown")
     content = chat.get("content", "")
     logging.info(f"{role}: {content}")
@@ -48,12 +58,14 @@ def save_results(st):
 
     messages = [entry for entry in st.session_state.messages if entry.get("role") != "Administrator"]
 
+    totals = st.session_state.ledger.totals()
+
     data = [
         st.session_state.pills,
         str(messages),
-        ("$" + str(st.session_state.total_cost)),
-        st.session_state.input_tokens,
-        st.session_state.output_tokens,
+        ("$" + str(totals["cost"])),
+        totals["input_tokens"],
+        totals["output_tokens"],
         st.session_state.feedback,
         str(st.session_state.stars),
         end_reason,
@@ -78,3 +90,22 @@ def save_results(st):
         writer.writerow(data)
 
     print(f"Data saved to CSV file at: {output_file}")
+
+    save_call_rows(st)
+
+
+def save_call_rows(st):
+    # One row per model call, linked to the conversation by its start time
+    output_file = "saved_calls.csv"
+    headers = ["Start Time"] + CostLedger.FIELDS
+
+    file_exists = os.path.exists(output_file)
+
+    with open(output_file, mode="a", newline="") as file:
+        writer = csv.writer(file)
+        if not file_exists:
+            writer.writerow(headers)
+        for row in st.session_state.ledger.rows:
+            writer.writerow([str(st.session_state.start_time)] + [row[field] for field in CostLedger.FIELDS])
+
+    print(f"Per-call costs saved to CSV file at: {output_file}")
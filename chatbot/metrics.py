@@ -0,0 +1,44 @@
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    Thread-safe record of recent request latencies, shared across sessions.
+    Keeps the last `window` samples for percentiles plus lifetime totals.
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+            self._total += seconds
+
+    def summary(self):
+        """
+        :return: Dict with request count, mean and p50/p95/max latency in milliseconds.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+            total = self._total
+
+        if not samples:
+            return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+
+        def percentile(p):
+            return samples[min(int(p * len(samples)), len(samples) - 1)] * 1000
+
+        return {
+            "count": count,
+            "mean_ms": total / count * 1000,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": samples[-1] * 1000,
+        }
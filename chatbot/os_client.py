@@ -0,0 +1,87 @@
+import threading
+import time
+
+import boto3
+from metrics import LatencyTracker
+from resources import shared_resource
+from settings import get_settings
+
+DEFAULT_CLIENT_SETTINGS = {
+    "pool_maxsize": 20,
+    "timeout": 10,
+    "max_retries": 2,
+    "retry_on_timeout": True,
+}
+
+_trackers_lock = threading.Lock()
+_trackers = {}
+
+
+def _tracker(operation):
+    with _trackers_lock:
+        if operation not in _trackers:
+            _trackers[operation] = LatencyTracker()
+        return _trackers[operation]
+
+
+def _record(url, seconds):
+    # Bucket by the last path segment (_search, _msearch, _mget, _doc...)
+    # so search time can be watched separately from everything else.
+    operation = url.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1] or "/"
+    _tracker(operation).record(seconds)
+    _tracker("all").record(seconds)
+
+
+# opensearchpy is slow to import, so the timed connection class is only
+# defined when the client is first built.
+@shared_resource
+def timed_connection_class():
+    from opensearchpy import RequestsHttpConnection
+
+    class TimedRequestsHttpConnection(RequestsHttpConnection):
+        def perform_request(self, method, url, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().perform_request(method, url, *args, **kwargs)
+            finally:
+                _record(url, time.perf_counter() - start)
+
+    return TimedRequestsHttpConnection
+
+
+def _credentials():
+    # Keep the refreshable credentials object rather than freezing it; the
+    # signer asks it for a fresh snapshot on every request, so temporary
+    # credentials roll over without rebuilding the client.
+    return boto3.Session().get_credentials()
+
+
+@shared_resource
+def get_opensearch_client():
+    """
+    The process-wide OpenSearch client, built on first use.
+    """
+    from opensearchpy import AWSV4SignerAuth, OpenSearch
+
+    settings = get_settings().section('opensearch_client', DEFAULT_CLIENT_SETTINGS)
+    config = get_settings()
+    return OpenSearch(
+        hosts=[{'host': config.opensearch_endpoint, 'port': 443}],
+        http_auth=AWSV4SignerAuth(_credentials(), config.region, 'aoss'),
+        use_ssl=True,
+        verify_certs=True,
+        connection_class=timed_connection_class(),
+        pool_maxsize=settings['pool_maxsize'],
+        timeout=settings['timeout'],
+        max_retries=settings['max_retries'],
+        retry_on_timeout=settings['retry_on_timeout'],
+    )
+
+
+def get_search_stats():
+    """
+    :return: Dict of latency summaries keyed by operation, plus "all".
+    """
+    with _trackers_lock:
+        trackers = dict(_trackers)
+    return {operation: tracker.summary() for operation, tracker in trackers.items()}
@@ -1,81 +1,187 @@
-import boto3
-from opensearchpy import OpenSearch,RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
-from search_utils import hybrid_search
-import yaml
-
-# Load Config
-with open('../config.yaml', 'r') as file:
-    config = yaml.safe_load(file)
-
-
-def initialize_opensearch():
-    region = config['region']
-    service = 'aoss'
-    host = config['opensearch_endpoint']
-
-    credentials = boto3.Session().get_credentials()
-    awsauth = AWS4Auth(credentials.access_key, credentials.secret_key,
-                       region, service, session_token=credentials.token)
-
-    client = OpenSearch(
-        hosts = [{'host': host, 'port': 443}],
-        http_auth = awsauth,
-        use_ssl = True,
-        verify_certs = True,
-        connection_class = RequestsHttpConnection
+import json
+from concurrent.futures import ThreadPoolExecutor
+from article_store import SEARCH_FIELDS
+from bedrock_client import get_connection_stats
+from logging_config import get_logger
+from os_client import get_opensearch_client, get_search_stats
+from postprocess import get_postprocess_stats, select_hits
+from resources import shared_resource
+from result_cache import get_index_version, get_result_cache, result_key
+from search_utils import embed, embedding_cache_stats, hybrid_search
+from semantic_cache import get_semantic_cache
+from settings import get_settings
+
+
+@shared_resource
+def _executor():
+    # Shared by every session; two workers per in-flight lookup.
+    return ThreadPoolExecutor(
+        max_workers=get_settings().section('retrieval').get('concurrent_workers', 8),
+        thread_name_prefix="os-query",
     )
 
-    return client
-
-def select_top_documents(hybrid_results, max_docs=10):
-    documents = hybrid_results['hits']['hits']
-    sorted_docs = sorted(documents, key=lambda x: x['_score'], reverse=True)
-    
-    if len(sorted_docs) <= max_docs:
-        return sorted_docs
-    
-    selected_docs = sorted_docs[:max_docs]
-    scores = [doc['_score'] for doc in selected_docs]
-    
-    score_diffs = [scores[i] - scores[i+1] for i in range(len(scores)-1)]
-    if score_diffs:
-        max_drop_index = max(score_diffs.index(max(score_diffs)), 4)
-        return sorted_docs[:max_drop_index+1]
-    else:
-        return selected_docs
-
-def getSimilarDocs(prompt,embedding):
-    osClient = initialize_opensearch()
 
+def build_queries(prompt, embedding, size=20):
+    # Only the fields needed to list the issues; the full article is loaded
+    # by article_store once one is chosen
     lexical_query = {
         "query": {
             "match": {
                 "passage": prompt
             }
         },
-        "size": 20,
-        "_source": {"exclude": ["embedding"]}
+        "size": size,
+        "_source": {"includes": SEARCH_FIELDS}
     }
-    
+
     semantic_query = {
         "query": {
             "knn": {
                 "embedding": {
                     "vector": embedding,
-                    "k": 20
+                    "k": size
                 }
             }
         },
-        "size": 20,
-        "_source": {"exclude": ["embedding"]}
+        "size": size,
+        "_source": {"includes": SEARCH_FIELDS}
     }
 
-    lexical_results = osClient.search(index=config['opensearch_index'], body=lexical_query)
-    semantic_results = osClient.search(index=config['opensearch_index'], body=semantic_query)
+    return lexical_query, semantic_query
+
+
+def _search_sequential(osClient, index, lexical_query, semantic_query):
+    lexical_results = osClient.search(index=index, body=lexical_query)
+    semantic_results = osClient.search(index=index, body=semantic_query)
+    return lexical_results, semantic_results
+
+
+def _search_msearch(osClient, index, lexical_query, semantic_query):
+    # One round trip: both queries go out in a single _msearch body and come
+    # back in request order.
+    body = [{"index": index}, lexical_query, {"index": index}, semantic_query]
+    responses = osClient.msearch(body=body)["responses"]
+    for response in responses:
+        if "error" in response:
+            raise RuntimeError(f"msearch sub-query failed: {response['error']}")
+    return responses[0], responses[1]
+
+
+def _search_concurrent(osClient, index, lexical_query, semantic_query):
+    lexical_future = _executor().submit(osClient.search, index=index, body=lexical_query)
+    semantic_future = _executor().submit(osClient.search, index=index, body=semantic_query)
+    return lexical_future.result(), semantic_future.result()
+
+
+RETRIEVAL_MODES = {
+    "sequential": _search_sequential,
+    "msearch": _search_msearch,
+    "concurrent": _search_concurrent,
+}
+
+
+DEFAULT_FUSION = {
+    "strategy": "interpolate",
+    "normalizer": "minmax",
+    "alpha": 0.5,
+    "rrf_k": 60,
+}
+
 
-    hybrid_results = hybrid_search(20, lexical_results, semantic_results, interpolation_weight=0.5, normalizer="minmax", use_rrf=False)
-    
-    selected_docs = select_top_documents(hybrid_results)
+def retrieve(osClient, index, prompt, embedding, mode="msearch", fusion=None):
+    """
+    Run the lexical and kNN queries with the given retrieval mode and fuse them.
+    :param mode: "sequential", "msearch" (single round trip) or "concurrent" (thread pool).
+    :param fusion: Fusion strategy, normalizer, alpha and rrf_k (see fusion.py); defaults to DEFAULT_FUSION.
+    :return: The hybrid results, identical for every mode.
+    """
+    fusion = fusion or DEFAULT_FUSION
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {list(RETRIEVAL_MODES)}")
 
-    return selected_docs
+    lexical_query, semantic_query = build_queries(prompt, embedding)
+    lexical_results, semantic_results = RETRIEVAL_MODES[mode](osClient, index, lexical_query, semantic_query)
+
+    return hybrid_search(
+        20,
+        lexical_results,
+        semantic_results,
+        interpolation_weight=fusion["alpha"],
+        normalizer=fusion["normalizer"],
+        rrf_k=fusion["rrf_k"],
+        strategy=fusion["strategy"],
+    )
+
+
+def forget_document(doc_id):
+    """
+    Drop cached search results that offer doc_id, after it turned out to be
+    missing from the index.
+    """
+    for cache in (get_result_cache(), get_semantic_cache()):
+        if cache is not None:
+            cache.discard_document(doc_id)
+
+
+def getSimilarDocs(prompt, embedding=None):
+    """
+    Look the prompt up in the exact-text result cache, then (after embedding
+    it) in the semantic cache of recent queries, and only search OpenSearch
+    when both miss.
+    :param embedding: The prompt's embedding; computed here only when the
+                      result cache misses.
+    :return: (the issues to offer the user, best first, dict of hits
+             dropped per post-processing rule)
+    """
+    index = get_settings().opensearch_index
+    mode = get_settings().section('retrieval').get('mode', 'msearch')
+    fusion = get_settings().section('retrieval.fusion', DEFAULT_FUSION)
+
+    cache = get_result_cache()
+    semantic = get_semantic_cache()
+    generation = get_index_version().current() if cache is not None or semantic is not None else None
+    hits = None
+    if cache is not None:
+        # The retrieval mode is left out of the key: every mode gives the same results
+        key = result_key(index, prompt, fusion)
+        hits = cache.get(key)
+
+    if hits is None:
+        if embedding is None:
+            embedding = embed(prompt)
+        if semantic is not None:
+            scope = json.dumps([index, fusion], sort_keys=True)
+            hits, similarity = semantic.get(embedding, scope)
+            if hits is not None:
+                get_logger(__name__).debug(f"Semantic cache hit at cosine {similarity:.3f}")
+        if hits is None:
+            hybrid_results = retrieve(get_opensearch_client(), index, prompt, embedding, mode, fusion)
+            hits = hybrid_results['hits']['hits']
+            if semantic is not None:
+                semantic.put(embedding, scope, hits, generation)
+        if cache is not None:
+            cache.put(key, hits, generation)
+
+    # Top-k, score floors and the gap cut in one pass
+    selected_docs, drops = select_hits(hits)
+    get_logger(__name__).debug(f"Retrieval kept {len(selected_docs)} issues, dropped {drops}")
+
+    return selected_docs, drops
+
+
+def retrieval_stats():
+    """
+    Process-wide counters for the sidebar and benchmarks: result, semantic
+    and embedding cache hit rates ({} when disabled), post-processing drops,
+    OpenSearch request latency per operation and Bedrock connection reuse.
+    """
+    cache = get_result_cache()
+    semantic = get_semantic_cache()
+    return {
+        "result_cache": cache.stats() if cache is not None else {},
+        "semantic_cache": semantic.stats() if semantic is not None else {},
+        "embedding_cache": embedding_cache_stats(),
+        "postprocess": get_postprocess_stats().summary(),
+        "search": get_search_stats(),
+        "bedrock": get_connection_stats(),
+    }
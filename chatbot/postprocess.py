@@ -0,0 +1,124 @@
+import heapq
+import threading
+
+from resources import shared_resource
+from settings import get_settings
+
+# Thresholds set to None are off. min_lexical_score applies to the raw BM25
+# score and min_cosine to the kNN score converted back to a cosine; a hit the
+# query did not return at all is not judged by that threshold, so a strong
+# match from only one query is kept.
+# Absolute relevance is judged on the raw cosine: fused scores are normalized
+# per query (the best hit is always 1.0 under minmax), so a floor on them
+# cannot reject a poor best match and min_fused_score is off by default.
+# 0.3 sits above the cosine Titan v2 gives unrelated text; tune it from the
+# drops logged per lookup.
+DEFAULT_POSTPROCESS = {
+    "max_results": 10,
+    "min_fused_score": None,
+    "max_score_gap": 0.1,
+    "min_lexical_score": None,
+    "min_cosine": 0.3,
+}
+
+RULES = ("top_k", "min_fused_score", "max_score_gap", "min_lexical_score", "min_cosine")
+
+
+def knn_cosine(score):
+    """
+    Invert OpenSearch's cosinesimil kNN score, 1 / (2 - cosine).
+    """
+    return 2 - 1 / score
+
+
+class PostprocessStats:
+    """
+    Process-wide counts of what post-processing kept and dropped, by rule,
+    and of the outcome users saw: no match, straight to diagnosis, or a
+    list of issues to choose from.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.candidates = 0
+        self.kept = 0
+        self.drops = dict.fromkeys(RULES, 0)
+        self.outcomes = {"none": 0, "single": 0, "choice": 0}
+
+    def record(self, kept, drops):
+        """
+        Count one lookup whose result was shown to a user.
+        :param kept: Number of issues offered.
+        :param drops: The dict of drops per rule from select_hits.
+        """
+        candidates = kept + sum(drops.values())
+        outcome = "none" if kept == 0 else "single" if kept == 1 else "choice"
+        with self._lock:
+            self.lookups += 1
+            self.candidates += candidates
+            self.kept += kept
+            for rule, count in drops.items():
+                self.drops[rule] += count
+            self.outcomes[outcome] += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "candidates": self.candidates,
+                "kept": self.kept,
+                "drops": dict(self.drops),
+                "outcomes": dict(self.outcomes),
+            }
+
+
+@shared_resource
+def get_postprocess_stats():
+    return PostprocessStats()
+
+
+def _fails(value, minimum):
+    return minimum is not None and value is not None and value < minimum
+
+
+def select_hits(hits, settings=None):
+    """
+    Pick the issues to offer the user from the fused hits in one pass:
+    heap top-k on the fused score, then, best first, an absolute floor on
+    the fused score, a cut at the first score gap wider than max_score_gap,
+    and optional floors on the raw lexical score and kNN cosine.
+    :return: (selected hits best first, dict of hits dropped per rule)
+    """
+    settings = settings or get_settings().section('retrieval.postprocess', DEFAULT_POSTPROCESS)
+    min_fused = settings["min_fused_score"]
+    max_gap = settings["max_score_gap"]
+    drops = dict.fromkeys(RULES, 0)
+
+    # Ties keep retrieval order
+    top = heapq.nlargest(
+        settings["max_results"], enumerate(hits),
+        key=lambda item: (item[1]["_score"], -item[0]),
+    )
+    drops["top_k"] = len(hits) - len(top)
+
+    selected = []
+    for position, (_, hit) in enumerate(top):
+        score = hit["_score"]
+        # Scores only fall from here, so both cuts end the pass
+        if min_fused is not None and score < min_fused:
+            drops["min_fused_score"] += len(top) - position
+            break
+        if selected and max_gap is not None and selected[-1]["_score"] - score > max_gap:
+            drops["max_score_gap"] += len(top) - position
+            break
+        if _fails(hit.get("_lexical_score"), settings["min_lexical_score"]):
+            drops["min_lexical_score"] += 1
+            continue
+        semantic = hit.get("_semantic_score")
+        if _fails(knn_cosine(semantic) if semantic is not None else None, settings["min_cosine"]):
+            drops["min_cosine"] += 1
+            continue
+        selected.append(hit)
+
+    return selected, drops
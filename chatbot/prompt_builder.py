@@ -0,0 +1,102 @@
+from settings import get_settings
+
+CACHE_POINT = {"type": "ephemeral"}
+
+# Stands in for the simulated opening input ("Hi", "Ok", ...) that is sent to
+# the model but never stored, since the Messages API must start with a user turn.
+OPENING_USER_TURN = "Hello"
+
+
+def _text_block(text, cache):
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = CACHE_POINT
+    return block
+
+
+def latest_admin_content(transcript):
+    for message in reversed(transcript):
+        if message["role"] == "Administrator":
+            return message["content"]
+    return ""
+
+
+def build_system(instructions, passage=None, static_prefix=None, cache=True, summary=None):
+    """
+    Assemble the system blocks from most to least stable, each ending in a
+    cache breakpoint: the fixed prefix (e.g. control-block instructions), the
+    mode prompt, the selected article passage, then the rolling summary of
+    turns that have left the history window.
+    """
+    system = []
+    for text in (
+        static_prefix,
+        instructions,
+        passage and f"Help desk issue document:\n{passage}",
+        summary and f"Summary of the earlier conversation:\n{summary}",
+    ):
+        if text:
+            system.append(_text_block(text, cache))
+    return system
+
+
+def build_messages(transcript, prompt, start=0):
+    """
+    Turn the transcript into alternating user/assistant messages.
+    Administrator entries (prompts and passages) are left out; the current
+    ones travel in the system blocks instead. The new prompt is added unless
+    it is already the last user message in the transcript.
+    :param start: Index of the first transcript message to include.
+    """
+    messages = []
+    last = None
+    for index in range(start, len(transcript)):
+        message = transcript[index]
+        role = message["role"]
+        if role not in ("user", "assistant"):
+            continue
+        last = message
+        if messages and messages[-1]["role"] == role:
+            messages[-1]["content"] += f"\n\n{message['content']}"
+        else:
+            messages.append({"role": role, "content": message["content"]})
+
+    # The caller stores a typed prompt before sending it; simulated inputs are never stored
+    if not (last and last["role"] == "user" and last["content"] == prompt):
+        if messages and messages[-1]["role"] == "user":
+            messages[-1]["content"] += f"\n\n{prompt}"
+        else:
+            messages.append({"role": "user", "content": prompt})
+
+    if messages[0]["role"] != "user":
+        messages.insert(0, {"role": "user", "content": OPENING_USER_TURN})
+    return messages
+
+
+def build_chat_request(transcript, prompt, instructions="", passage=None, static_prefix=None, summary=None, start=0):
+    """
+    Build the native Anthropic request body for the chat model.
+    :param instructions: The mode prompt; defaults to the newest Administrator
+                         prompt in the transcript.
+    :param passage: Article text for diagnose mode, sent as its own cached block.
+    :param summary: Rolling summary of the messages before start (see HistoryWindow).
+    """
+    cache = get_settings().section('prompt_caching').get('enabled', True)
+    system = build_system(
+        instructions or latest_admin_content(transcript),
+        passage,
+        static_prefix,
+        cache,
+        summary,
+    )
+
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 1000,
+        "temperature": 0.7,
+        "amazon-bedrock-guardrailConfig": {
+            "streamProcessingMode": "ASYNCHRONOUS"
+        },
+        "system": system,
+        "messages": build_messages(transcript, prompt, start),
+    }
@@ -0,0 +1,23 @@
+import functools
+import threading
+
+
+def shared_resource(build):
+    """
+    Decorator for zero-argument factories of process-wide resources
+    (worker pools, caches, tokenizers). The resource is built on the first
+    call, under a lock so concurrent sessions never build it twice, and the
+    same object is returned afterwards.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(build)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(build())
+        return instance[0]
+
+    return get
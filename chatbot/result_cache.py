@@ -0,0 +1,152 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from embedding_cache import normalize_text
+from index_version import IndexVersion
+from os_client import get_opensearch_client
+from resources import shared_resource
+from settings import get_settings
+
+DEFAULT_RESULT_CACHE = {
+    "enabled": True,
+    "max_entries": 1024,
+    "ttl_seconds": 900,
+    "version_check_seconds": 30,
+}
+
+
+def result_key(index, query, params):
+    """
+    Key for a retrieval: the index, the query text with case and whitespace
+    collapsed, and every parameter that changes the fused ranking.
+    """
+    payload = json.dumps([index, normalize_text(query), params], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def compact_hits(hits):
+    return tuple(
+        (hit["_id"], hit["_score"], hit.get("_lexical_score"), hit.get("_semantic_score"), hit["_source"])
+        for hit in hits
+    )
+
+
+def expand_hits(entry):
+    # Fresh dicts every time: callers replace `_source` in place (article_store.load_article)
+    return [
+        {
+            "_id": doc_id,
+            "_source": dict(source),
+            "_score": score,
+            "_lexical_score": lexical,
+            "_semantic_score": semantic,
+        }
+        for doc_id, score, lexical, semantic, source in entry
+    ]
+
+
+class ResultCache:
+    """
+    Process-wide LRU of fused retrieval results (hit ids, scores and the
+    search fields), bounded by entry count and TTL. Every entry belongs to
+    one index generation; when the generation moves, the whole cache is
+    dropped, so no result survives a reindex.
+    """
+
+    def __init__(self, version, max_entries=1024, ttl_seconds=900):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _sync(self, generation):
+        if generation != self._generation:
+            if self._generation is not None:
+                self._entries.clear()
+                self._stats["invalidations"] += 1
+            self._generation = generation
+
+    def get(self, key):
+        """
+        :return: The cached hits for key as a new list of hit dicts, or None.
+        """
+        generation = self.version.current()
+        with self._lock:
+            self._sync(generation)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return expand_hits(entry[1])
+
+    def put(self, key, hits, generation):
+        """
+        :param generation: The index version the search ran against; the
+                           result is dropped if the index has moved on since.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.time(), compact_hits(hits))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def discard_document(self, doc_id):
+        """
+        Drop every cached result that lists doc_id, once it is known to be
+        gone from the index.
+        """
+        with self._lock:
+            stale = [key for key, (_, hits) in self._entries.items() if any(hit[0] == doc_id for hit in hits)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["index_version"] = self._generation
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+@shared_resource
+def get_index_version():
+    settings = get_settings().section('result_cache', DEFAULT_RESULT_CACHE)
+    return IndexVersion(get_opensearch_client, get_settings().opensearch_index, settings['version_check_seconds'])
+
+
+@shared_resource
+def get_result_cache():
+    """
+    :return: The shared ResultCache, or None when result_cache is disabled in config.
+    """
+    settings = get_settings().section('result_cache', DEFAULT_RESULT_CACHE)
+    if not settings['enabled']:
+        return None
+    return ResultCache(get_index_version(), settings['max_entries'], settings['ttl_seconds'])
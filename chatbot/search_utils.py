@@ -1,29 +1,23 @@
 import numpy as np
-import boto3
 import json
-import yaml
+import fusion
+from bedrock_client import get_bedrock_client
+from embedding_cache import cache_from_config
+from resources import shared_resource
+from settings import get_settings
 
-# Load Config
-with open('../config.yaml', 'r') as file:
-    config = yaml.safe_load(file)
+@shared_resource
+def _embedding_cache():
+    return cache_from_config(get_settings().raw)
 
 def normalize_scores_(scores,normalizer):
     """
-    Normalize scores using L2/min-max normalization.
+    Normalize scores using L2/min-max/z-score normalization.
     :param scores: The list of scores to normalize.
-    :param mormalizer: normalizing tekniq
+    :param normalizer: "minmax", "zscore" or "l2".
     :return: The normalized scores.
     """
-    if len(scores) == 0:
-        return np.array([])
-    if "minmax" in normalizer:
-        scores = np.array(scores)
-        return (scores - np.min(scores)) / (np.max(scores) - np.min(scores))
-    elif "l2" in normalizer:
-        scores = np.array(scores)
-        return scores / np.linalg.norm(scores)
-    else:
-        raise "enter either minmax or l2 as normalizer"
+    return fusion.normalize(scores, normalizer)
 
 def interpolate_scores(lexical_score, semantic_score, alpha=0.5):
     """
@@ -36,7 +30,31 @@ def interpolate_scores(lexical_score, semantic_score, alpha=0.5):
     return alpha * lexical_score + (1 - alpha) * semantic_score
 
 
-def reciprocal_rank_fusion(lexical_results, semantic_results, k=60):
+def _ids_and_scores(results):
+    hits = results['hits']['hits']
+    return [hit['_id'] for hit in hits], np.fromiter((hit['_score'] for hit in hits), dtype=np.float64, count=len(hits))
+
+
+def _fused_hits(lexical_results, semantic_results, ids, scores):
+    # Lexical _source wins when a document was found by both queries.
+    # The raw per-query scores ride along for absolute thresholds (see postprocess.py).
+    lexical = {hit['_id']: hit for hit in lexical_results['hits']['hits']}
+    semantic = {hit['_id']: hit for hit in semantic_results['hits']['hits']}
+    fused = []
+    for doc_id, score in zip(ids, scores):
+        lexical_hit = lexical.get(doc_id)
+        semantic_hit = semantic.get(doc_id)
+        fused.append({
+            '_id': doc_id,
+            '_source': (lexical_hit or semantic_hit)['_source'],
+            '_score': float(score),
+            '_lexical_score': lexical_hit['_score'] if lexical_hit else None,
+            '_semantic_score': semantic_hit['_score'] if semantic_hit else None,
+        })
+    return {'hits': {'hits': fused}}
+
+
+def reciprocal_rank_fusion(lexical_results, semantic_results, k=60, top_K_results=None):
     """
     Combine lexical and semantic search results using Reciprocal Rank Fusion (RRF).
     :param lexical_results: The results from the lexical search.
@@ -44,85 +62,35 @@ def reciprocal_rank_fusion(lexical_results, semantic_results, k=60):
     :param k: The parameter for RRF (default: 60).
     :return: The combined search results.
     """
-    combined_results = {}
-
-    for hit in lexical_results['hits']['hits']:
-        doc_id = hit['_id']
-        if doc_id not in combined_results:
-            combined_results[doc_id] = {'_id': doc_id, '_source': hit['_source'], '_score': 0}
-        combined_results[doc_id]['_score'] += 1 / (k + hit['_score'])
-
-    for hit in semantic_results['hits']['hits']:
-        doc_id = hit['_id']
-        if doc_id not in combined_results:
-            combined_results[doc_id] = {'_id': doc_id, '_source': hit['_source'], '_score': 0}
-        combined_results[doc_id]['_score'] += 1 / (k + hit['_score'])
-
-    combined_results = list(combined_results.values())
-    combined_results = sorted(combined_results, key=lambda x: x['_score'], reverse=True)
+    return hybrid_search(top_K_results, lexical_results, semantic_results, strategy="rrf", rrf_k=k)
 
-    return {'hits': {'hits': combined_results}}
 
-
-def hybrid_search(top_K_results,lexical_results, semantic_results, interpolation_weight=0.5, normalizer="minmax",use_rrf=False, rrf_k=60):
+def hybrid_search(top_K_results,lexical_results, semantic_results, interpolation_weight=0.5, normalizer="minmax",use_rrf=False, rrf_k=60, strategy=None):
     """
     Perform hybrid search by combining lexical and semantic search results.
     :param lexical_results: The results from the lexical search.
     :param semantic_results: The results from the semantic search.
     :param interpolation_weight: The interpolation weight for score interpolation.
     :param normalizer: The normalization function (default: minmax normalization).
+    :param strategy: "interpolate", "convex" or "rrf" (see fusion.py); use_rrf is shorthand for "rrf".
     :return: The combined search results.
     """
-
-    if use_rrf:
-        return reciprocal_rank_fusion(lexical_results, semantic_results, k=rrf_k)
-
-    combined_results = []
-
-    # Normalize the scores from lexical and semantic searches
-    lexical_scores = [hit['_score'] for hit in lexical_results['hits']['hits']]
-    semantic_scores = [hit['_score'] for hit in semantic_results['hits']['hits']]
-    normalized_lexical_scores = normalize_scores_(lexical_scores,normalizer)
-    normalized_semantic_scores = normalize_scores_(semantic_scores,normalizer)
-
-    # Combine the results based on document IDs
-    lexical_docs = {hit['_id']: (hit, score) for hit, score in zip(lexical_results['hits']['hits'], normalized_lexical_scores)}
-    semantic_docs = {hit['_id']: (hit, score) for hit, score in zip(semantic_results['hits']['hits'], normalized_semantic_scores)}
-
-    for doc_id in set(lexical_docs.keys()) | set(semantic_docs.keys()):
-        lexical_hit, lexical_score = lexical_docs.get(doc_id, (None, 0))
-        semantic_hit, semantic_score = semantic_docs.get(doc_id, (None, 0))
-
-        if lexical_hit and semantic_hit:
-            # Interpolate scores if both lexical and semantic results are available
-            interpolated_score = interpolate_scores(lexical_score, semantic_score, interpolation_weight)
-            combined_hit = {
-                '_id': doc_id,
-                '_source': {**lexical_hit['_source']},
-                '_score': interpolated_score,
-            }
-        elif lexical_hit:
-            # Use lexical hit if only lexical result is available
-            combined_hit = {
-                '_id': doc_id,
-                '_source': lexical_hit['_source'],
-                '_score': lexical_score
-            }
-        else:
-            # Use semantic hit if only semantic result is available
-            combined_hit = {
-                '_id': doc_id,
-                '_source': semantic_hit['_source'],
-                '_score': semantic_score
-            }
-        combined_results.append(combined_hit)
-    # Sort the combined results by the blended score
-    combined_results = sorted(combined_results, key=lambda hit: hit['_score'], reverse=True)
-    return {'hits': {'hits': combined_results[:top_K_results]}}
-
-def embed(message):
-    client = boto3.client("bedrock-runtime", region_name=config['region'])
-    model_id = config['model']['embedding']
+    if strategy is None:
+        strategy = "rrf" if use_rrf else "interpolate"
+
+    lexical_ids, lexical_scores = _ids_and_scores(lexical_results)
+    semantic_ids, semantic_scores = _ids_and_scores(semantic_results)
+
+    ids, scores = fusion.fuse(
+        lexical_ids, lexical_scores, semantic_ids, semantic_scores,
+        strategy=strategy, normalizer=normalizer, alpha=interpolation_weight,
+        rrf_k=rrf_k, k=top_K_results,
+    )
+    return _fused_hits(lexical_results, semantic_results, ids, scores)
+
+def _invoke_embedding(message):
+    client = get_bedrock_client()
+    model_id = get_settings().model.embedding
     
     native_request = {"inputText" : message}
     request = json.dumps(native_request)
@@ -130,4 +98,14 @@ def embed(message):
     model_response = json.loads(response["body"].read())
     embedding = model_response["embedding"]
 
-    return embedding
\ No newline at end of file
+    return embedding
+
+def embed(message):
+    cache = _embedding_cache()
+    if cache is None:
+        return _invoke_embedding(message)
+    return cache.get_or_compute(message, get_settings().model.embedding, _invoke_embedding)
+
+def embedding_cache_stats():
+    cache = _embedding_cache()
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,169 @@
+import threading
+import time
+
+import numpy as np
+
+from resources import shared_resource
+from result_cache import compact_hits, expand_hits, get_index_version
+from settings import get_settings
+
+DEFAULT_SEMANTIC_CACHE = {
+    "enabled": True,
+    "capacity": 512,
+    "min_similarity": 0.95,
+    "ttl_seconds": 900,
+}
+
+# Bucket edges for the best-match cosine of every lookup, to tune min_similarity
+SIMILARITY_BINS = (-1.0, 0.5, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.99, 1.0)
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _bucket(similarity):
+    position = np.searchsorted(SIMILARITY_BINS, similarity, side="right") - 1
+    return int(np.clip(position, 0, len(SIMILARITY_BINS) - 2))
+
+
+class SemanticCache:
+    """
+    Retrieval results for recent queries, found by embedding similarity
+    rather than exact text, so paraphrases of a question reuse one search.
+    Query embeddings are kept unit-length in a capacity x dim float32
+    matrix; a lookup is one matrix-vector product. When full, the least
+    recently used slot is replaced. Entries only match queries made with
+    the same retrieval scope (index and fusion settings) and are dropped
+    when the index version moves.
+    """
+
+    def __init__(self, version, capacity=512, min_similarity=0.95, ttl_seconds=900):
+        self.version = version
+        self.capacity = capacity
+        self.min_similarity = min_similarity
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._generation = None
+        self._vectors = None
+        self._created = np.zeros(capacity)
+        self._used = np.zeros(capacity)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._scopes = np.empty(capacity, dtype=object)
+        self._results = [None] * capacity
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._similarities = np.zeros(len(SIMILARITY_BINS) - 1, dtype=np.int64)
+
+    def _reset(self):
+        self._valid[:] = False
+        self._results = [None] * self.capacity
+
+    def _sync(self, generation):
+        if generation != self._generation:
+            if self._generation is not None:
+                self._reset()
+                self._stats["invalidations"] += 1
+            self._generation = generation
+
+    def get(self, embedding, scope):
+        """
+        :param scope: The retrieval parameters the result must have been made with.
+        :return: (cached hits as new hit dicts or None, best cosine similarity or None)
+        """
+        query = _unit(embedding)
+        generation = self.version.current()
+        with self._lock:
+            self._sync(generation)
+            if self._vectors is None or self._vectors.shape[1] != query.size:
+                self._stats["misses"] += 1
+                return None, None
+
+            eligible = self._valid & (self._scopes == scope)
+            if self.ttl_seconds is not None:
+                eligible &= time.time() - self._created <= self.ttl_seconds
+            if not eligible.any():
+                self._stats["misses"] += 1
+                return None, None
+
+            similarities = np.where(eligible, self._vectors @ query, -np.inf)
+            slot = int(np.argmax(similarities))
+            best = float(similarities[slot])
+            self._similarities[_bucket(best)] += 1
+            if best < self.min_similarity:
+                self._stats["misses"] += 1
+                return None, best
+            self._used[slot] = time.time()
+            self._stats["hits"] += 1
+            return expand_hits(self._results[slot]), best
+
+    def put(self, embedding, scope, hits, generation):
+        """
+        :param generation: The index version the search ran against; the
+                           result is dropped if the index has moved on since.
+        """
+        vector = _unit(embedding)
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._vectors is None or self._vectors.shape[1] != vector.size:
+                # First entry, or the embedding model changed
+                self._vectors = np.zeros((self.capacity, vector.size), dtype=np.float32)
+                self._reset()
+
+            now = time.time()
+            free = ~self._valid
+            if self.ttl_seconds is not None:
+                free |= now - self._created > self.ttl_seconds
+            if free.any():
+                slot = int(np.argmax(free))
+            else:
+                slot = int(np.argmin(self._used))
+                self._stats["evictions"] += 1
+            self._vectors[slot] = vector
+            self._created[slot] = now
+            self._used[slot] = now
+            self._scopes[slot] = scope
+            self._results[slot] = compact_hits(hits)
+            self._valid[slot] = True
+
+    def discard_document(self, doc_id):
+        """
+        Drop every cached result that lists doc_id, once it is known to be
+        gone from the index.
+        """
+        with self._lock:
+            for slot, hits in enumerate(self._results):
+                if hits is not None and any(hit[0] == doc_id for hit in hits):
+                    self._valid[slot] = False
+                    self._results[slot] = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = int(self._valid.sum())
+            stats["index_version"] = self._generation
+            stats["similarity_histogram"] = {
+                f"{low:.2f}-{high:.2f}": int(count)
+                for low, high, count in zip(SIMILARITY_BINS, SIMILARITY_BINS[1:], self._similarities)
+            }
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+@shared_resource
+def get_semantic_cache():
+    """
+    :return: The shared SemanticCache, or None when semantic_cache is disabled in config.
+    """
+    settings = get_settings().section('semantic_cache', DEFAULT_SEMANTIC_CACHE)
+    if not settings['enabled']:
+        return None
+    return SemanticCache(
+        get_index_version(),
+        settings['capacity'],
+        settings['min_similarity'],
+        settings['ttl_seconds'],
+    )
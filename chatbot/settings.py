@@ -0,0 +1,75 @@
+import os
+import threading
+from dataclasses import dataclass, field
+
+import yaml
+
+CONFIG_PATH = os.environ.get("HELPDESK_CONFIG", "../config.yaml")
+
+_lock = threading.Lock()
+_settings = None
+
+
+@dataclass(frozen=True)
+class ModelIds:
+    chat: str
+    flag_raiser: str
+    summary: str
+    category_generation: str
+    redirect: str
+    ingest: str
+    embedding: str
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Typed view of config.yaml. The required keys are attributes; optional
+    tuning sections (retrieval, embedding_cache, pricing, ...) are read with
+    section(), merged over the caller's defaults.
+    """
+
+    region: str
+    opensearch_endpoint: str
+    opensearch_index: str
+    guardrail_id: str
+    guardrail_version: str
+    model: ModelIds
+    raw: dict = field(repr=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            region=data['region'],
+            opensearch_endpoint=data['opensearch_endpoint'],
+            opensearch_index=data['opensearch_index'],
+            guardrail_id=data['guardrail_id'],
+            guardrail_version=str(data['guardrail_version']),
+            model=ModelIds(**{name: data['model'][name] for name in ModelIds.__dataclass_fields__}),
+            raw=data,
+        )
+
+    def section(self, name, defaults=None):
+        """
+        :param name: Section name; dots reach into nested sections ("retrieval.fusion").
+        :param defaults: Values for the keys the section leaves out.
+        :return: New dict of the section over defaults ({} if both are missing).
+        """
+        data = self.raw
+        for part in name.split('.'):
+            data = data.get(part) or {}
+        return {**(defaults or {}), **data}
+
+
+def get_settings():
+    """
+    Parse config.yaml on first use and share the result with every module.
+    The path can be overridden with the HELPDESK_CONFIG environment variable.
+    """
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                with open(CONFIG_PATH, 'r') as file:
+                    _settings = Settings.from_dict(yaml.safe_load(file))
+    return _settings
@@ -0,0 +1,40 @@
+import hashlib
+
+# Index fields written at ingestion time.
+GUIDE_FIELD = "step_guide"
+STEPS_FIELD = "steps"
+VERSION_FIELD = "step_guide_version"
+HASH_FIELD = "passage_hash"
+
+
+def passage_hash(passage):
+    return hashlib.sha256(passage.encode("utf-8")).hexdigest()
+
+
+def guide_fields(guide, steps, passage, version):
+    """
+    :return: The index fields holding a pre-generated guide for passage.
+    """
+    return {
+        GUIDE_FIELD: guide,
+        STEPS_FIELD: steps,
+        VERSION_FIELD: version,
+        HASH_FIELD: passage_hash(passage),
+    }
+
+
+def stored_guide(source, version=1):
+    """
+    Return the pre-generated guide of an indexed article, or None when it is
+    missing or stale: generated by an older guide version than `version`, or
+    for a passage that has since changed.
+    :param source: The article's `_source` from OpenSearch.
+    """
+    guide = source.get(GUIDE_FIELD)
+    if not guide:
+        return None
+    if source.get(VERSION_FIELD, 0) < version:
+        return None
+    if source.get(HASH_FIELD) != passage_hash(source.get("passage", "")):
+        return None
+    return guide
@@ -0,0 +1,53 @@
+"""
+Benchmarks for hybrid score fusion, from 10 to 10,000 candidates per list:
+the NumPy engine in fusion.py, alone and through hybrid_search (which adds
+the hit-dict conversion), against the previous dict-and-set merge. Needs
+pytest-benchmark; run from the chatbot directory:
+
+    python -m pytest test_bench_fusion.py --benchmark-group-by=param:results
+"""
+import random
+
+import numpy as np
+import pytest
+
+import fusion
+from search_utils import hybrid_search
+from test_fusion import legacy_interpolate, make_pair
+
+pytest.importorskip("pytest_benchmark")
+
+SIZES = [10, 100, 1000, 10000]
+TOP_K = 20
+OVERLAP = 0.5
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=str)
+def results(request):
+    return make_pair(random.Random(0), request.param, OVERLAP)
+
+
+@pytest.mark.parametrize("strategy", fusion.STRATEGIES)
+def test_fuse(benchmark, results, strategy):
+    lexical, semantic = results
+    lexical_ids = [hit["_id"] for hit in lexical["hits"]["hits"]]
+    semantic_ids = [hit["_id"] for hit in semantic["hits"]["hits"]]
+    lexical_scores = np.array([hit["_score"] for hit in lexical["hits"]["hits"]])
+    semantic_scores = np.array([hit["_score"] for hit in semantic["hits"]["hits"]])
+    ids, _ = benchmark(
+        fusion.fuse, lexical_ids, lexical_scores, semantic_ids, semantic_scores, strategy=strategy, k=TOP_K,
+    )
+    assert ids.size == min(TOP_K, len(set(lexical_ids) | set(semantic_ids)))
+
+
+@pytest.mark.parametrize("strategy", fusion.STRATEGIES)
+def test_hybrid_search(benchmark, results, strategy):
+    lexical, semantic = results
+    fused = benchmark(hybrid_search, TOP_K, lexical, semantic, strategy=strategy)
+    assert len(fused["hits"]["hits"]) <= TOP_K
+
+
+def test_legacy_interpolate(benchmark, results):
+    lexical, semantic = results
+    fused = benchmark(legacy_interpolate, TOP_K, lexical, semantic)
+    assert len(fused["hits"]["hits"]) <= TOP_K
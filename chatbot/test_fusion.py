@@ -0,0 +1,135 @@
+"""
+Checks for the NumPy fusion engine against the previous dict-based merge.
+Run from the chatbot directory:
+
+    python -m pytest test_fusion.py
+"""
+import random
+
+import numpy as np
+import pytest
+
+import fusion
+from search_utils import hybrid_search
+
+
+def make_results(rng, ids, low, high):
+    hits = [{"_id": doc_id, "_score": rng.uniform(low, high), "_source": {"guide_title": doc_id}} for doc_id in ids]
+    hits.sort(key=lambda hit: hit["_score"], reverse=True)
+    return {"hits": {"hits": hits}}
+
+
+def make_pair(rng, count, overlap):
+    """
+    Lexical and semantic results of count hits each, sharing round(overlap * count) documents.
+    """
+    shared = round(overlap * count)
+    lexical_ids = [f"doc-{n}" for n in range(count)]
+    semantic_ids = rng.sample(lexical_ids, shared) + [f"doc-{n}" for n in range(count, 2 * count - shared)]
+    return make_results(rng, lexical_ids, 1.0, 12.0), make_results(rng, semantic_ids, 0.3, 0.9)
+
+
+def legacy_interpolate(top_k, lexical_results, semantic_results, alpha=0.5):
+    # The pre-fusion.py hybrid_search merge (minmax, per-hit dicts and a set union)
+    def minmax(scores):
+        scores = np.array(scores)
+        spread = scores.max() - scores.min()
+        return (scores - scores.min()) / spread if spread else np.ones_like(scores)
+
+    lexical_hits = lexical_results["hits"]["hits"]
+    semantic_hits = semantic_results["hits"]["hits"]
+    lexical_docs = {hit["_id"]: (hit, score) for hit, score in zip(lexical_hits, minmax([h["_score"] for h in lexical_hits]))}
+    semantic_docs = {hit["_id"]: (hit, score) for hit, score in zip(semantic_hits, minmax([h["_score"] for h in semantic_hits]))}
+    combined = []
+    for doc_id in set(lexical_docs) | set(semantic_docs):
+        lexical_hit, lexical_score = lexical_docs.get(doc_id, (None, 0))
+        semantic_hit, semantic_score = semantic_docs.get(doc_id, (None, 0))
+        if lexical_hit and semantic_hit:
+            score = alpha * lexical_score + (1 - alpha) * semantic_score
+        elif lexical_hit:
+            score = lexical_score
+        else:
+            score = semantic_score
+        combined.append({"_id": doc_id, "_source": (lexical_hit or semantic_hit)["_source"], "_score": score})
+    combined.sort(key=lambda hit: hit["_score"], reverse=True)
+    return {"hits": {"hits": combined[:top_k]}}
+
+
+def legacy_rrf(lexical_results, semantic_results, k=60):
+    scores = {}
+    for results in (lexical_results, semantic_results):
+        for rank, hit in enumerate(results["hits"]["hits"], start=1):
+            scores[hit["_id"]] = scores.get(hit["_id"], 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def ranking(results):
+    return [(hit["_id"], hit["_score"]) for hit in results["hits"]["hits"]]
+
+
+@pytest.mark.parametrize("overlap", [0.0, 0.3, 1.0])
+def test_interpolate_matches_legacy(overlap):
+    rng = random.Random(1)
+    lexical, semantic = make_pair(rng, 200, overlap)
+    # Hits can tie (each list's best normalizes to 1.0) and the legacy merge orders ties by set iteration, so compare by id
+    new = dict(ranking(hybrid_search(None, lexical, semantic)))
+    old = dict(ranking(legacy_interpolate(None, lexical, semantic)))
+    assert new.keys() == old.keys()
+    assert all(new[doc_id] == pytest.approx(old[doc_id]) for doc_id in new)
+
+    top_new = [score for _, score in ranking(hybrid_search(20, lexical, semantic))]
+    top_old = [score for _, score in ranking(legacy_interpolate(20, lexical, semantic))]
+    assert np.allclose(top_new, top_old)
+
+
+def test_single_source_hits_keep_their_own_score():
+    rng = random.Random(2)
+    lexical = make_results(rng, ["a", "b", "c"], 1.0, 12.0)
+    semantic = make_results(rng, ["c", "d"], 0.3, 0.9)
+    fused = dict(ranking(hybrid_search(None, lexical, semantic)))
+    lexical_norm = dict(zip(
+        [hit["_id"] for hit in lexical["hits"]["hits"]],
+        fusion.normalize([hit["_score"] for hit in lexical["hits"]["hits"]]),
+    ))
+    semantic_norm = dict(zip(
+        [hit["_id"] for hit in semantic["hits"]["hits"]],
+        fusion.normalize([hit["_score"] for hit in semantic["hits"]["hits"]]),
+    ))
+    assert fused["a"] == pytest.approx(lexical_norm["a"])
+    assert fused["b"] == pytest.approx(lexical_norm["b"])
+    assert fused["d"] == pytest.approx(semantic_norm["d"])
+    assert fused["c"] == pytest.approx(0.5 * lexical_norm["c"] + 0.5 * semantic_norm["c"])
+
+
+def test_rrf_uses_one_based_ranks():
+    rng = random.Random(3)
+    lexical, semantic = make_pair(rng, 50, 0.5)
+    fused = ranking(hybrid_search(None, lexical, semantic, strategy="rrf", rrf_k=60))
+    expected = legacy_rrf(lexical, semantic, k=60)
+    assert len(fused) == len(expected)
+    for doc_id, score in fused:
+        assert score == pytest.approx(expected[doc_id])
+    assert [score for _, score in fused] == sorted((score for _, score in fused), reverse=True)
+
+
+def test_top_k_ties_at_the_boundary_keep_the_earliest():
+    scores = np.array([0.5, 0.9, 0.5, 0.9, 0.5, 0.1])
+    # Three 0.5s compete for the last two places; the lower indices win
+    assert fusion.top_k(scores, 4).tolist() == [1, 3, 0, 2]
+    assert fusion.top_k(scores, 2).tolist() == [1, 3]
+    assert fusion.top_k(scores, None).tolist() == [1, 3, 0, 2, 4, 5]
+
+
+def test_top_k_zero_is_empty():
+    assert fusion.top_k(np.array([0.5, 0.9]), 0).tolist() == []
+    ids, scores = fusion.fuse(["a"], np.array([1.0]), ["b"], np.array([1.0]), k=0)
+    assert ids.size == 0 and scores.size == 0
+
+
+def test_fuse_tie_break_follows_first_appearance():
+    ids, scores = fusion.fuse(
+        ["a", "b"], np.array([1.0, 1.0]), ["c", "a"], np.array([1.0, 1.0]), k=2,
+    )
+    # Every normalized score is 1.0: lexical order first, then semantic-only hits
+    assert ids.tolist() == ["a", "b"]
+    assert scores.tolist() == [1.0, 1.0]
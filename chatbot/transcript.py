@@ -0,0 +1,73 @@
+class Transcript:
+    """
+    Append-only chat history that renders and token-counts each message once.
+    Behaves like the list of {"role", "content"} dicts it replaces (append,
+    iteration, indexing, len), so existing session code keeps working.
+    """
+
+    def __init__(self, count_tokens):
+        """
+        :param count_tokens: Function mapping a string to its token count.
+        """
+        self._count_tokens = count_tokens
+        self._messages = []
+        self._rendered = []
+        self._tokens = []
+        # _prefix_tokens[i] is the token total of the first i messages
+        self._prefix_tokens = [0]
+
+    @staticmethod
+    def render_message(message):
+        return f"{message['role']} : {message['content']}\n"
+
+    def append(self, message):
+        rendered = self.render_message(message)
+        tokens = self._count_tokens(rendered)
+        self._messages.append(message)
+        self._rendered.append(rendered)
+        self._tokens.append(tokens)
+        self._prefix_tokens.append(self._prefix_tokens[-1] + tokens)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def _start(self, last):
+        if last is None:
+            return 0
+        return max(len(self._messages) - last, 0)
+
+    def render(self, last=None):
+        """
+        Render the history in the "role : content" form sent to the model.
+        :param last: Only render the newest `last` messages (O(last)).
+        """
+        return "".join(self._rendered[self._start(last):])
+
+    def render_roles(self, skip_roles=()):
+        """
+        Render every message whose role is not in skip_roles.
+        """
+        return "".join(
+            rendered
+            for message, rendered in zip(self._messages, self._rendered)
+            if message["role"] not in skip_roles
+        )
+
+    def token_count(self, last=None):
+        """
+        Token total of the whole history, or of the newest `last` messages, in O(1).
+        """
+        return self._prefix_tokens[-1] - self._prefix_tokens[self._start(last)]
+
+    def message_tokens(self, index):
+        return self._tokens[index]
+
+    @property
+    def total_tokens(self):
+        return self._prefix_tokens[-1]
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_utils import decide_redirect, profanity_check
+from os_query import getSimilarDocs
+from resources import shared_resource
+from settings import get_settings
+
+
+def pipeline_config():
+    return get_settings().section('turn_pipeline')
+
+
+@shared_resource
+def _executor():
+    # Shared by every session. Each turn needs at most three workers.
+    return ThreadPoolExecutor(
+        max_workers=pipeline_config().get('workers', 16),
+        thread_name_prefix="turn",
+    )
+
+
+def submit_background(fn, *args):
+    """
+    Run fn(*args) on the shared worker pool.
+    :return: The Future for the call.
+    """
+    return _executor().submit(fn, *args)
+
+
+def _speculative_retrieval(prompt):
+    # getSimilarDocs embeds the prompt itself when the result cache misses
+    return getSimilarDocs(prompt)
+
+
+class TurnPipeline:
+    """
+    Starts the independent pre-processing for one user message at once:
+    the guardrail check, the helpdesk redirect decision and, speculatively,
+    the embedding + OpenSearch lookup for the raw prompt. Each result is
+    awaited only where it is needed. Work that turns out to be unnecessary
+    is cancelled if it has not started, and its result ignored otherwise.
+    None of these tasks touch st.session_state, so they are safe to run off
+    the script thread.
+    """
+
+    def __init__(self, prompt, current_helpdesk=None, helpdesk_info=None, redirect=True):
+        self.prompt = prompt
+        self._guardrail = _executor().submit(profanity_check, prompt)
+        self._redirect = None
+        self._retrieval = None
+
+        if redirect:
+            self._redirect = _executor().submit(decide_redirect, prompt, current_helpdesk, helpdesk_info)
+        if pipeline_config().get('speculative_retrieval', True):
+            self._retrieval = _executor().submit(_speculative_retrieval, prompt)
+
+    def is_profane(self):
+        return self._guardrail.result()
+
+    def redirect_info(self):
+        """
+        :return: (decide_redirect response text, Usage)
+        """
+        if self._redirect is None:
+            raise RuntimeError("This turn was started without a redirect decision")
+        return self._redirect.result()
+
+    def similar_docs(self, prompt):
+        """
+        Return the retrieval results for prompt, reusing the speculative lookup
+        when it was made for the same text.
+        :return: (issues, drops per rule) as from getSimilarDocs.
+        """
+        if self._retrieval is not None and prompt == self.prompt:
+            retrieval, self._retrieval = self._retrieval, None
+            return retrieval.result()
+        return _speculative_retrieval(prompt)
+
+    def discard(self):
+        """
+        Drop any outstanding work for this turn. Running tasks finish in the
+        background and their results are never read.
+        """
+        for name in ("_redirect", "_retrieval"):
+            future = getattr(self, name)
+            if future is not None:
+                future.cancel()
+                setattr(self, name, None)
+
+
+def start_turn(prompt, current_helpdesk=None, helpdesk_info=None, redirect=True):
+    """
+    :return: A TurnPipeline for prompt, or None when the pipeline is disabled in config.
+    """
+    if not pipeline_config().get('enabled', True):
+        return None
+    return TurnPipeline(prompt, current_helpdesk, helpdesk_info, redirect)
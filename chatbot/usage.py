@@ -0,0 +1,82 @@
+from resources import shared_resource
+from settings import get_settings
+
+
+class Usage:
+    """
+    Token counts Bedrock reported for one model call. input_tokens excludes
+    prompt-cache reads and writes, which are billed at their own rates.
+    """
+
+    def __init__(self, input_tokens=0, output_tokens=0, latency_ms=None, cache_read_tokens=0, cache_write_tokens=0):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.latency_ms = latency_ms
+        self.cache_read_tokens = cache_read_tokens
+        self.cache_write_tokens = cache_write_tokens
+
+    def __repr__(self):
+        return (
+            f"Usage(input_tokens={self.input_tokens}, output_tokens={self.output_tokens}, "
+            f"cache_read_tokens={self.cache_read_tokens}, cache_write_tokens={self.cache_write_tokens}, "
+            f"latency_ms={self.latency_ms})"
+        )
+
+
+def usage_from_body(response_body):
+    """
+    Read the `usage` block of a parsed invoke_model response body.
+    """
+    usage = response_body.get("usage") or {}
+    return Usage(
+        usage.get("input_tokens", 0),
+        usage.get("output_tokens", 0),
+        cache_read_tokens=usage.get("cache_read_input_tokens", 0),
+        cache_write_tokens=usage.get("cache_creation_input_tokens", 0),
+    )
+
+
+class StreamUsage(Usage):
+    """
+    Accumulates usage from invoke_model_with_response_stream chunks.
+    message_start carries the input count, message_delta the running output
+    count, and the final chunk's amazon-bedrock-invocationMetrics the
+    authoritative totals and latency.
+    """
+
+    def observe(self, chunk):
+        if chunk["type"] == "message_start":
+            usage = chunk["message"].get("usage") or {}
+            self.input_tokens = usage.get("input_tokens", self.input_tokens)
+            self.output_tokens = usage.get("output_tokens", self.output_tokens)
+            self.cache_read_tokens = usage.get("cache_read_input_tokens", self.cache_read_tokens)
+            self.cache_write_tokens = usage.get("cache_creation_input_tokens", self.cache_write_tokens)
+        elif chunk["type"] == "message_delta":
+            usage = chunk.get("usage") or {}
+            self.output_tokens = usage.get("output_tokens", self.output_tokens)
+
+        metrics = chunk.get("amazon-bedrock-invocationMetrics")
+        if metrics:
+            self.input_tokens = metrics.get("inputTokenCount", self.input_tokens)
+            self.output_tokens = metrics.get("outputTokenCount", self.output_tokens)
+            self.latency_ms = metrics.get("invocationLatency", self.latency_ms)
+            self.cache_read_tokens = metrics.get("cacheReadInputTokenCount", self.cache_read_tokens)
+            self.cache_write_tokens = metrics.get("cacheWriteInputTokenCount", self.cache_write_tokens)
+
+
+def estimate_tokens(text):
+    """
+    Pre-flight token estimate, used before a request is sent (e.g. for
+    history budgets). Billing always uses the counts Bedrock reports.
+    Uses tiktoken only when usage.preflight_tokenizer is enabled; otherwise
+    a ~4 characters per token heuristic that costs no CPU.
+    """
+    if not get_settings().section('usage').get('preflight_tokenizer', False):
+        return (len(text) + 3) // 4
+    return len(get_tokenizer().encode(text))
+
+
+@shared_resource
+def get_tokenizer():
+    import tiktoken
+    return tiktoken.get_encoding("o200k_base")
@@ -0,0 +1,78 @@
+"""
+Benchmark for the ingestion pipeline against local stand-ins.
+
+Each stand-in stage sleeps for a simulated call latency and raises a
+Bedrock-style ThrottlingException whenever more than its capacity of calls
+are in flight, so the adaptive limits and retries can be exercised without
+AWS. Run from the data-ingest directory:
+
+    python bench_ingest.py --articles 200 --workers 1 8 16 --capacity 6
+"""
+import argparse
+import threading
+import time
+
+from ingest_pipeline import IngestPipeline, Stage
+
+
+class StandInThrottle(Exception):
+    def __init__(self):
+        super().__init__("ThrottlingException: Too many requests")
+        self.response = {"Error": {"Code": "ThrottlingException"}}
+
+
+class StandInService:
+    def __init__(self, latency_ms, capacity):
+        self.latency = latency_ms / 1000
+        self.capacity = capacity
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, job):
+        with self._lock:
+            self.calls += 1
+            if self.in_flight >= self.capacity:
+                self.throttled += 1
+                raise StandInThrottle()
+            self.in_flight += 1
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run(articles, workers, capacity, max_rps):
+    services = {
+        "report": StandInService(400, capacity),
+        "embed": StandInService(60, capacity * 2),
+        "index": StandInService(40, capacity * 4),
+    }
+    stages = [Stage(name, service, workers) for name, service in services.items()]
+    pipeline = IngestPipeline(stages, max_rps=max_rps, base_delay=0.05, max_delay=1.0, progress_seconds=3600)
+    result = pipeline.run({"name": f"article-{i}"} for i in range(articles))
+    throttled = sum(service.throttled for service in services.values())
+    return result, throttled
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--capacity", type=int, default=6, help="Concurrent report calls before throttling")
+    parser.add_argument("--max-rps", type=float, default=None)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'seconds':>9} {'docs/s':>8} {'indexed':>8} {'throttled':>10}")
+    for workers in args.workers:
+        result, throttled = run(args.articles, workers, args.capacity, args.max_rps)
+        print(
+            f"{workers:>8} {result['elapsed_seconds']:>9.2f} {result['docs_per_second']:>8.2f} "
+            f"{result['indexed']:>8} {throttled:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
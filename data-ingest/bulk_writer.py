@@ -0,0 +1,283 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+RETRIABLE_STATUS = {429, 500, 502, 503, 504}
+
+# ignore_above of the `.keyword` subfields in os_index_creator.py: longer
+# values are not indexed there, so a name over it can never be matched
+MAX_KEY_LENGTH = 256
+
+
+class BulkWriter:
+    """
+    Buffers index and delete operations and writes them with the _bulk API.
+    A batch is sent once it reaches max_docs operations or max_bytes of
+    NDJSON. Items the server rejects with a retriable status (429/5xx) are
+    resent on their own with backoff; the rest of the batch is never resent.
+    Safe to share between threads.
+
+    OpenSearch Serverless vector search collections reject custom document
+    ids, so with key_field set documents are matched by that field instead:
+    before a batch goes out, one search finds the existing copies of its
+    articles; the batch indexes the new versions, then deletes the old
+    copies (by their generated ids) of the articles that indexed, so a failed
+    write never leaves an article missing.
+    """
+
+    def __init__(self, client, index, max_docs=100, max_bytes=5 * 1024 * 1024, max_retries=5, base_delay=1.0, on_done=None, key_field=None):
+        """
+        :param on_done: Called after each batch with the (op, name) pairs that
+                        succeeded, e.g. to checkpoint progress.
+        :param key_field: Keyword field holding the article name (e.g.
+                          "guide_file_name"); upserts and deletes go by name
+                          and doc ids are ignored. None sends doc ids as _id.
+        """
+        self.client = client
+        self.index = index
+        self.key_field = key_field
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.on_done = on_done
+
+        self._lock = threading.Lock()
+        self._lines = []
+        self._bytes = 0
+        self.batches = []
+        self.indexed = 0
+        self.deleted = 0
+        self.failed = []
+
+    def _action(self, op, doc_id):
+        action = {"_index": self.index}
+        if doc_id is not None:
+            action["_id"] = doc_id
+        return json.dumps({op: action})
+
+    def add(self, document, doc_id=None, name=None):
+        """
+        Queue one document, sending the batch if it is full. With a doc_id
+        (or, under key_field, the document's name) an existing document is
+        replaced (upsert).
+        :param name: Label used in failure reports (defaults to doc_id).
+        """
+        if self.key_field is not None:
+            doc_id = None
+            name = name or document[self.key_field]
+            if not self._matchable(name):
+                return
+        self._queue(("index", self._action("index", doc_id), json.dumps(document), name or doc_id))
+
+    def delete(self, doc_id, name=None):
+        """
+        Queue the deletion of one document (under key_field, every document
+        named name). A document that is already gone counts as deleted.
+        """
+        if self.key_field is not None:
+            if not self._matchable(name):
+                return
+            # Resolved to the generated ids when the batch is sent
+            self._queue(("delete", None, None, name))
+            return
+        self._queue(("delete", self._action("delete", doc_id), None, name or doc_id))
+
+    def _matchable(self, name):
+        """
+        Reject a name too long for the keyword field, which would otherwise
+        be added again, never replaced, on every run.
+        """
+        if len(name) <= MAX_KEY_LENGTH:
+            return True
+        print(f"Skipping {name}: names over {MAX_KEY_LENGTH} characters cannot be matched in the index")
+        with self._lock:
+            self.failed.append(name)
+        return False
+
+    def _queue(self, item):
+        size = len(item[1] or "") + len(item[2] or "") + 2
+        batch = None
+        with self._lock:
+            if self._lines and (len(self._lines) >= self.max_docs or self._bytes + size > self.max_bytes):
+                batch = self._take()
+            self._lines.append(item)
+            self._bytes += size
+        if batch:
+            self._send(batch)
+
+    def _take(self):
+        batch, self._lines, self._bytes = self._lines, [], 0
+        return batch
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._send(batch)
+
+    def _existing_ids(self, names):
+        """
+        :return: Dict of name to the ids of the documents currently indexed under it.
+        """
+        response = self.client.search(index=self.index, body={
+            "size": 10000,
+            "_source": {"includes": [self.key_field]},
+            "query": {"terms": {f"{self.key_field}.keyword": sorted(names)}},
+        })
+        ids = {}
+        for hit in response["hits"]["hits"]:
+            ids.setdefault(hit["_source"][self.key_field], []).append(hit["_id"])
+        return ids
+
+    def _resolve(self, items):
+        """
+        Under key_field, expand each deletion into deletes of the article's
+        current copies, and look up the copies each upsert replaces.
+        :return: (items to send, dict of name to the purges of its replaced
+                  copies, (op, name) pairs already done)
+        """
+        if self.key_field is None:
+            return items, {}, []
+        existing = self._existing_ids({item[3] for item in items})
+        resolved = []
+        purges = {}
+        done = []
+        for op, action, source, name in items:
+            copies = existing.pop(name, [])
+            if op == "index":
+                # A replaced copy is a "purge": part of the upsert, not a
+                # deletion, sent only once the new version is indexed
+                purges[name] = [("purge", self._action("delete", doc_id), None, name) for doc_id in copies]
+                resolved.append((op, action, source, name))
+            elif copies:
+                resolved.extend((op, self._action("delete", doc_id), None, name) for doc_id in copies)
+            else:
+                # Nothing left to delete
+                done.append((op, name))
+        return resolved, purges, done
+
+    def _bulk(self, items):
+        body = "".join(
+            f"{action}\n{source}\n" if source is not None else f"{action}\n"
+            for _, action, source, _ in items
+        )
+        return self.client.bulk(body=body), len(body)
+
+    def _send(self, items):
+        start = time.perf_counter()
+        try:
+            pending, purges, succeeded = self._resolve(items)
+        except Exception as e:
+            print(f"Looking up existing documents failed: {e}")
+            self._fail(items)
+            pending, purges, succeeded = [], {}, []
+        written, sent_bytes, retried = self._write(pending)
+        succeeded.extend(written)
+
+        # Old copies go only once their replacement is in, so a failed index
+        # leaves the previous version searchable
+        indexed = [name for op, name in written if op == "index"]
+        purged, purge_bytes, purge_retried = self._write([purge for name in indexed for purge in purges[name]])
+        sent_bytes += purge_bytes
+        retried += purge_retried
+        purged = Counter(name for _, name in purged)
+        # An article with an old copy left is not reported done, so the next
+        # run upserts it again and retries the purge
+        unpurged = {name for name in indexed if purged[name] < len(purges[name])}
+        for name in sorted(unpurged):
+            print(f"Old copies of {name} could not be deleted; it will be replaced again on the next run")
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            for op, _ in succeeded:
+                if op == "index":
+                    self.indexed += 1
+                else:
+                    self.deleted += 1
+        self._record(len(items), sent_bytes, elapsed, retried)
+        succeeded = [(op, name) for op, name in succeeded if not (op == "index" and name in unpurged)]
+        if self.on_done is not None and succeeded:
+            self.on_done(succeeded)
+
+    def _write(self, pending):
+        """
+        Send items with _bulk, resending those rejected with a retriable
+        status with backoff.
+        :return: ((op, name) pairs that succeeded, bytes sent, items retried)
+        """
+        succeeded = []
+        sent_bytes = 0
+        retried = 0
+        delay = self.base_delay
+        for attempt in range(1, self.max_retries + 1):
+            if not pending:
+                break
+            try:
+                response, size = self._bulk(pending)
+            except Exception as e:
+                # The whole request failed (throttled, timed out, ...): resend it as is
+                status = getattr(e, "status_code", None)
+                if attempt == self.max_retries or (isinstance(status, int) and status not in RETRIABLE_STATUS):
+                    print(f"Bulk request failed after {attempt} attempts: {e}")
+                    self._fail(pending)
+                    break
+                retried += len(pending)
+            else:
+                sent_bytes += size
+                retry = []
+                rejected = []
+                for item, result in zip(pending, response["items"]):
+                    outcome = next(iter(result.values()))
+                    status = outcome.get("status", 200)
+                    if status < 300 or (item[0] != "index" and status == 404):
+                        succeeded.append((item[0], item[3]))
+                        continue
+                    if status in RETRIABLE_STATUS and attempt < self.max_retries:
+                        retry.append(item)
+                    else:
+                        print(f"Bulk {item[0]} of {item[3]} failed with {status}: {outcome.get('error')}")
+                        rejected.append(item)
+                self._fail(rejected)
+                if not retry:
+                    break
+                # Only the items rejected with a retriable status go out again
+                retried += len(retry)
+                pending = retry
+            time.sleep(random.uniform(0, delay))
+            delay *= 2
+        return succeeded, sent_bytes, retried
+
+    def _fail(self, items):
+        with self._lock:
+            self.failed.extend(item[3] for item in items)
+
+    def _record(self, docs, sent_bytes, elapsed, retried):
+        batch = {
+            "docs": docs,
+            "bytes": sent_bytes,
+            "latency_ms": elapsed * 1000,
+            "docs_per_second": docs / elapsed if elapsed else 0.0,
+            "retried_items": retried,
+        }
+        with self._lock:
+            self.batches.append(batch)
+        print(
+            f"Bulk batch: {docs} docs, {sent_bytes / 1024:.0f} KiB, {batch['latency_ms']:.0f} ms, "
+            f"{batch['docs_per_second']:.1f} docs/s, {retried} items retried"
+        )
+
+    def stats(self):
+        with self._lock:
+            batches = list(self.batches)
+        seconds = sum(batch["latency_ms"] for batch in batches) / 1000
+        return {
+            "batches": len(batches),
+            "indexed": self.indexed,
+            "deleted": self.deleted,
+            "failed": len(self.failed),
+            "mean_batch_ms": seconds * 1000 / len(batches) if batches else 0.0,
+            "docs_per_second": self.indexed / seconds if seconds else 0.0,
+        }
@@ -1,6 +1,12 @@
 from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
 import boto3
+import os
+import sys
 import yaml
+from manifest import DEFAULT_MANIFEST_PATH
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot'))
+from index_version import bump_version
 
 # Load Config
 with open('config.yaml', 'r') as file:
@@ -40,4 +46,12 @@ for doc_id in document_ids:
         delete_response = client.delete(index=index_name, id=doc_id)
         print(f"Deleted document ID: {doc_id} | Result: {delete_response['result']}")
     except Exception as e:
-        print(f"Error deleting document ID: {doc_id} | Error: {str(e)}")
\ No newline at end of file
+        print(f"Error deleting document ID: {doc_id} | Error: {str(e)}")
+
+# Cached chatbot search results point at the deleted documents
+print(f"Index version is now {bump_version(client, index_name)}")
+
+# The manifest no longer matches the index; the next ingestion run starts from scratch
+if os.path.exists(DEFAULT_MANIFEST_PATH):
+    os.remove(DEFAULT_MANIFEST_PATH)
+    print(f"Removed ingestion manifest {DEFAULT_MANIFEST_PATH}")
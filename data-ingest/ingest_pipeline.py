@@ -0,0 +1,276 @@
+"""
+Concurrent ingestion engine.
+
+Each article moves through a chain of stages (report -> guide -> embed ->
+index by default), connected by queues. Every stage has its own worker
+threads and an AIMD concurrency limit: throttling responses halve the limit,
+successful calls grow it back by about one slot per limit-many calls. An
+optional global requests-per-second cap is shared by all stages.
+
+Stages are plain functions of a job dict, so the engine can be driven by
+local stand-ins (see bench_ingest.py) as well as by opensearch_insert.
+"""
+import queue
+import random
+import threading
+import time
+
+THROTTLE_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+    "ServiceUnavailableException",
+}
+THROTTLE_STATUS = {429, 503}
+
+_DONE = object()
+
+
+def is_throttle(exc):
+    """
+    True when exc is a rate-limit response from Bedrock (botocore ClientError)
+    or OpenSearch (TransportError with status 429/503).
+    """
+    code = (getattr(exc, "response", None) or {}).get("Error", {}).get("Code")
+    if code in THROTTLE_CODES:
+        return True
+    if getattr(exc, "status_code", None) in THROTTLE_STATUS:
+        return True
+    # langchain wraps Bedrock errors in a ValueError carrying the original message
+    message = str(exc)
+    return "Throttling" in message or "TooManyRequests" in message
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on the number of calls a stage has in flight.
+    """
+
+    def __init__(self, limit, max_limit=None, min_limit=1, decrease=0.5):
+        self.max_limit = max_limit or limit
+        self.min_limit = min_limit
+        self.decrease = decrease
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.throttles = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= max(int(self.limit), self.min_limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttles += 1
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1/max_rps apart across all threads. max_rps of
+    None or 0 disables the cap.
+    """
+
+    def __init__(self, max_rps=None):
+        self.interval = 1 / max_rps if max_rps else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Stage:
+    """
+    :param fn: Called with the job dict; fills in its part of the job.
+    :param workers: Worker threads, and the ceiling of the AIMD limit.
+    :param optional: On final failure pass the job on instead of dropping it.
+    """
+
+    def __init__(self, name, fn, workers=4, optional=False):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.optional = optional
+        self.limiter = AdaptiveLimiter(workers)
+        self.inbox = queue.Queue(maxsize=workers * 4)
+        self.completed = 0
+        self.failed = 0
+
+
+class IngestPipeline:
+    def __init__(self, stages, max_rps=None, max_attempts=8, base_delay=1.0, max_delay=30.0, progress_seconds=10):
+        self.stages = stages
+        self.rate = RateLimiter(max_rps)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.progress_seconds = progress_seconds
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.finished = 0
+        self.dropped = []
+        self.started = None
+
+    def _call(self, stage, job):
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            self.rate.acquire()
+            stage.limiter.acquire()
+            throttled = False
+            try:
+                stage.fn(job)
+                return
+            except Exception as e:
+                throttled = is_throttle(e)
+                # Throttles get the full budget; other errors a few attempts
+                if attempt == self.max_attempts or (not throttled and attempt >= 3):
+                    raise
+                print(f"{stage.name} attempt {attempt} failed for {job['name']}: {e}")
+            finally:
+                stage.limiter.release(throttled)
+            # Full jitter so throttled workers do not retry in lockstep
+            time.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, self.max_delay)
+
+    def _worker(self, index, stage):
+        downstream = self.stages[index + 1].inbox if index + 1 < len(self.stages) else None
+        while True:
+            job = stage.inbox.get()
+            if job is _DONE:
+                return
+            try:
+                self._call(stage, job)
+                with self._lock:
+                    stage.completed += 1
+            except Exception as e:
+                with self._lock:
+                    stage.failed += 1
+                if not stage.optional:
+                    print(f"{stage.name} failed for {job['name']}, skipping it: {e}")
+                    self._finish(job, dropped=True)
+                    continue
+                print(f"{stage.name} failed for {job['name']}, continuing without it: {e}")
+            if downstream is not None:
+                downstream.put(job)
+            else:
+                self._finish(job)
+
+    def _finish(self, job, dropped=False):
+        with self._lock:
+            self.finished += 1
+            if dropped:
+                self.dropped.append(job['name'])
+
+    def progress(self):
+        elapsed = time.perf_counter() - self.started
+        done = self.finished - len(self.dropped)
+        stages = " | ".join(
+            f"{stage.name} {stage.completed} (limit {stage.limiter.limit:.1f}, throttled {stage.limiter.throttles})"
+            for stage in self.stages
+        )
+        return (
+            f"{self.finished}/{self.submitted} articles, {len(self.dropped)} failed, "
+            f"{done / elapsed if elapsed else 0.0:.2f} docs/s | {stages}"
+        )
+
+    def _reporter(self, stop):
+        while not stop.wait(self.progress_seconds):
+            print(self.progress())
+
+    def run(self, jobs):
+        """
+        Push every job through all stages and wait for them to finish.
+        :param jobs: Iterable of dicts with at least "name".
+        :return: Dict with counts, elapsed seconds and docs/s.
+        """
+        self.started = time.perf_counter()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(index, stage),
+                    name=f"ingest-{stage.name}-{number}", daemon=True,
+                )
+                thread.start()
+                threads.append((stage, thread))
+
+        stop = threading.Event()
+        reporter = threading.Thread(target=self._reporter, args=(stop,), daemon=True)
+        reporter.start()
+
+        for job in jobs:
+            self.submitted += 1
+            self.stages[0].inbox.put(job)
+
+        # Shut the stages down in order, so each one drains before the next stops
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                stage.inbox.put(_DONE)
+            for owner, thread in threads:
+                if owner is stage:
+                    thread.join()
+        stop.set()
+
+        elapsed = time.perf_counter() - self.started
+        indexed = self.finished - len(self.dropped)
+        print(self.progress())
+        return {
+            "submitted": self.submitted,
+            "indexed": indexed,
+            "failed": list(self.dropped),
+            "elapsed_seconds": elapsed,
+            "docs_per_second": indexed / elapsed if elapsed else 0.0,
+        }
+
+
+def default_stages(workers, writer=None, on_done=None):
+    """
+    The production stages, backed by opensearch_insert. Imported lazily so
+    the engine itself can run without AWS configuration.
+    :param writer: BulkWriter for the index stage; without one each document
+                   is indexed with its own request. Flush it after run().
+    :param on_done: Called with [("index", name)] once a document is indexed
+                    without a writer (a writer reports through its own on_done).
+    """
+    import opensearch_insert as ingest
+
+    def report(job):
+        job["data"] = ingest.report_data(job["text"], job["name"])
+
+    def guide(job):
+        job["guide"] = ingest.guide_text(job["text"], job["name"])
+
+    def embed(job):
+        job["embedding"] = ingest.generate_embedding(job["text"])
+
+    def index(job):
+        document = ingest.build_document(job["text"], job["name"], job["data"], job.get("guide"))
+        document["embedding"] = job["embedding"]
+        if writer is not None:
+            writer.add(document, doc_id=job.get("doc_id"), name=job["name"])
+            return
+        ingest.insert_into_opensearch(document, job.get("doc_id"))
+        if on_done is not None:
+            on_done([("index", job["name"])])
+
+    stages = [Stage("report", report, workers)]
+    if ingest.step_guide_config.get('enabled', True):
+        stages.append(Stage("guide", guide, workers, optional=True))
+    stages.append(Stage("embed", embed, workers))
+    stages.append(Stage("index", index, workers))
+    return stages
@@ -1,20 +1,80 @@
-from opensearch_insert import insert_document_os
-from aws_utils import *
+import argparse
 import os
-import time
+
+from ingest_pipeline import IngestPipeline, default_stages
+from manifest import DEFAULT_MANIFEST_PATH, IngestManifest, content_hash
+from opensearch_insert import bulk_writer, bump_index_version, results_cache
 from os_index_creator import check_create_index
 
+DEFAULT_FOLDER = "/home/ec2-user/Knowledge Articles/docx/rawText"
+
 def list_objects_in_folder(folder_path):
     return [os.path.join(folder_path, item) for item in os.listdir(folder_path)]
 
-check_create_index()
+def read_jobs(document_paths, manifest, full=False):
+    """
+    Yield a job for every article that is new or changed since it was last indexed.
+    """
+    skipped = 0
+    for file in document_paths:
+        file_name = os.path.basename(file)
+        with open(file, "r") as file:
+            text_content = file.read()
+        text_hash = content_hash(text_content)
+        if not full and manifest.is_current(file_name, text_hash):
+            skipped += 1
+            continue
+        doc_id = manifest.expect(file_name, text_hash)
+        yield {"name": file_name, "text": text_content, "doc_id": doc_id}
+    print(f"Skipped {skipped} unchanged articles")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest knowledge articles into OpenSearch.")
+    parser.add_argument("--folder", default=DEFAULT_FOLDER, help="Folder of raw article text files")
+    parser.add_argument("--workers", type=int, default=4, help="Worker threads per stage (upper bound of the adaptive limit)")
+    parser.add_argument("--max-rps", type=float, default=None, help="Cap on model/index requests per second across all stages")
+    parser.add_argument("--batch-docs", type=int, default=100, help="Documents per _bulk request")
+    parser.add_argument("--batch-mb", type=float, default=5, help="Maximum _bulk request size in MB")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Ingestion manifest (content hashes and checkpoints)")
+    parser.add_argument("--full", action="store_true", help="Reprocess every article, even unchanged ones")
+    parser.add_argument("--keep-removed", action="store_true", help="Do not delete articles that left the source folder")
+    parser.add_argument("--custom-ids", action="store_true", help="Upsert by stable document id (only for collections that accept custom _id values)")
+    parser.add_argument("--progress-seconds", type=float, default=10, help="Seconds between progress reports")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    check_create_index()
+
+    document_paths = list_objects_in_folder(args.folder)
+    manifest = IngestManifest(args.manifest)
+
+    # Every confirmed batch is checkpointed, so a crashed run resumes where it stopped
+    writer = bulk_writer(args.batch_docs, int(args.batch_mb * 1024 * 1024), on_done=manifest.confirm, custom_ids=args.custom_ids)
 
-folder_path = "/home/ec2-user/Knowledge Articles/docx/rawText"
-document_paths = list_objects_in_folder(folder_path)
+    if not args.keep_removed:
+        removed = manifest.removed(os.path.basename(path) for path in document_paths)
+        for name, doc_id in removed:
+            writer.delete(doc_id, name=name)
+        print(f"Deleting {len(removed)} articles removed from {args.folder}")
 
-for file in document_paths:
-    file_name = os.path.basename(file)
-    with open(file, "r") as file:
-        text_content = file.read()
-    document = insert_document_os(text_content, file_name)
+    pipeline = IngestPipeline(
+        default_stages(args.workers, writer),
+        max_rps=args.max_rps,
+        progress_seconds=args.progress_seconds,
+    )
+    result = pipeline.run(read_jobs(document_paths, manifest, args.full))
+    writer.flush()
 
+    bulk = writer.stats()
+    failed = result["failed"] + writer.failed
+    print(f"Processed {result['submitted']} articles in {result['elapsed_seconds']:.1f}s ({result['docs_per_second']:.2f} docs/s)")
+    print(f"Bulk indexed {bulk['indexed']} and deleted {bulk['deleted']} documents in {bulk['batches']} batches ({bulk['mean_batch_ms']:.0f} ms/batch, {bulk['docs_per_second']:.1f} docs/s)")
+    if bulk['indexed'] or bulk['deleted']:
+        print(f"Index version is now {bump_index_version()}")
+    if results_cache is not None:
+        cache = results_cache.stats()
+        print(f"Report cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%} hit rate)")
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
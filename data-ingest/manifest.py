@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'ingest_manifest.json')
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_id(guide_file_name):
+    """
+    Stable OpenSearch _id for an article, so re-ingesting it replaces the
+    existing document instead of adding a duplicate. Only sent with
+    `main.py --custom-ids`; otherwise articles are matched by name.
+    """
+    return hashlib.sha256(guide_file_name.encode("utf-8")).hexdigest()[:40]
+
+
+class IngestManifest:
+    """
+    Record of what is in the index: for each guide_file_name, the content
+    hash of the text it was built from and its document id. An entry is
+    only written once its document is confirmed indexed, and the file is
+    replaced atomically after every checkpoint, so an interrupted run
+    resumes with exactly the articles that never made it.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.entries = json.load(file).get("articles", {})
+
+    def is_current(self, name, text_hash):
+        entry = self.entries.get(name)
+        return entry is not None and entry["hash"] == text_hash
+
+    def expect(self, name, text_hash):
+        """
+        Note an article that is about to be (re)indexed.
+        :return: Its document id.
+        """
+        doc_id = document_id(name)
+        with self._lock:
+            self._pending[name] = {"hash": text_hash, "doc_id": doc_id}
+        return doc_id
+
+    def removed(self, present_names):
+        """
+        :return: (name, doc_id) of every recorded article no longer in the source folder.
+        """
+        present = set(present_names)
+        return [(name, entry["doc_id"]) for name, entry in self.entries.items() if name not in present]
+
+    def confirm(self, done):
+        """
+        Checkpoint a batch of finished operations.
+        :param done: (op, name) pairs, op being "index" or "delete".
+        """
+        with self._lock:
+            for op, name in done:
+                if op == "delete":
+                    self.entries.pop(name, None)
+                    continue
+                entry = self._pending.pop(name, None)
+                if entry is not None:
+                    entry["indexed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    self.entries[name] = entry
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"articles": self.entries}, file, indent=1, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
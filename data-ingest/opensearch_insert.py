@@ -1,24 +1,52 @@
 import boto3
 import json
+from botocore.config import Config
 from langchain_aws import BedrockEmbeddings
 from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
 from requests_aws4auth import AWS4Auth
+import os
 import re
+import sys
 import yaml
 import time
 
+# Modules used by both sides (the embedding cache, index fields, index version)
+# live with the chatbot, and must not depend on the chatbot's settings.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot'))
+from embedding_cache import cache_from_config
+import report_cache
+from bulk_writer import BulkWriter
+from condensed_passage import condensed_fields
+from index_version import bump_version
+from resources import shared_resource
+from step_guides import guide_fields
+
 # Load Config
 with open('../config.yaml', 'r') as file:
     config = yaml.safe_load(file)
 
-def generate_report(document_text):
-    with open("ingest_prompt.txt", "r") as file:
-        template = file.read()
+embedding_cache = cache_from_config(config)
+results_cache = report_cache.cache_from_config(config)
+step_guide_config = config.get('step_guides') or {}
+
+@shared_resource
+def get_bedrock_client():
+    """
+    One bedrock-runtime client for the whole run, shared by every stage
+    worker (boto3 clients are thread-safe; sessions are slow to build).
+    """
+    return boto3.session.Session().client(
+        "bedrock-runtime",
+        region_name=config['region'],
+        config=Config(max_pool_connections=32),
+    )
 
-    prompt = template.format(document=document_text)
+@shared_resource
+def get_embeddings_client():
+    return BedrockEmbeddings(client=get_bedrock_client(), model_id=config['model']['embedding'], region_name=config['region'])
 
-    bedrock_session = boto3.session.Session()
-    bedrock = bedrock_session.client("bedrock-runtime", region_name=config['region'])
+def _invoke_text_model(prompt, model_id):
+    bedrock = get_bedrock_client()
 
     body = json.dumps({
     "max_tokens": 4096,
@@ -26,20 +54,94 @@ def generate_report(document_text):
     "anthropic_version": "bedrock-2023-05-31"
     })
 
-    response = bedrock.invoke_model(body=body, modelId=config['model']['ingest'])
+    response = bedrock.invoke_model(body=body, modelId=model_id)
 
     response_body = json.loads(response.get("body").read())
     return response_body.get("content")[0].get("text")
 
+def _load_template(file_name):
+    with open(file_name, "r") as file:
+        return file.read()
+
+def generate_report(document_text, template=None):
+    if template is None:
+        template = _load_template("ingest_prompt.txt")
+
+    prompt = template.format(document=document_text)
+
+    return _invoke_text_model(prompt, config['model']['ingest'])
+
+def generate_guide(document_text, template=None):
+    """
+    Write the canonical step-by-step guide for an article with the chat
+    model, so the chatbot can replay it instead of regenerating it per user.
+    """
+    if template is None:
+        template = _load_template("guide_prompt.txt")
+
+    prompt = template.format(document=document_text)
+
+    guide = _invoke_text_model(prompt, config['model']['chat'])
+    return re.search(r'<guide>(.*?)</guide>', guide, re.DOTALL).group(1).strip()
+
+def _cached(kind, text_data, template, model_id, compute, guide_file_name):
+    if results_cache is None:
+        return compute()
+    return results_cache.get_or_compute(kind, text_data, template, model_id, compute, guide_file_name)
+
+def report_data(text_data, guide_file_name=""):
+    """
+    Parsed report for an article. Served from the result cache while the
+    article text, ingest_prompt.txt and the ingest model are unchanged.
+    """
+    template = _load_template("ingest_prompt.txt")
+    return _cached(
+        "report", text_data, template, config['model']['ingest'],
+        lambda: parse_report(generate_report(text_data, template)), guide_file_name,
+    )
+
+def guide_text(text_data, guide_file_name=""):
+    """
+    Step guide for an article, cached like report_data.
+    """
+    template = _load_template("guide_prompt.txt")
+    return _cached(
+        "guide", text_data, template, config['model']['chat'],
+        lambda: generate_guide(text_data, template), guide_file_name,
+    )
+
+def _with_backoff(fn, text_data, guide_file_name, max_retries=10):
+    delay = 1
+
+    # Exponential backoff
+    for attempt in range(1, max_retries + 1):
+        try:
+            return fn(text_data, guide_file_name)
+        except Exception as e:
+            if attempt < max_retries:
+                print(f"Attempt {attempt} for {fn.__name__} failed for {guide_file_name}: {e}. Retrying in {delay} seconds...")
+                time.sleep(delay)
+                delay *= 2
+            else:
+                print(f"Max retries reached for {fn.__name__} for {guide_file_name}.")
+                return None
+
 
 def generate_embedding(passage):
-    embeddings_client = BedrockEmbeddings(model_id=config['model']['embedding'], region_name=config['region'])
+    def compute(text):
+        return get_embeddings_client().embed_query(text)
 
-    embedding = embeddings_client.embed_query(passage)
-    return (embedding)
+    if embedding_cache is None:
+        return compute(passage)
+    return embedding_cache.get_or_compute(passage, config['model']['embedding'], compute)
 
 
-def insert_into_opensearch(document):
+@shared_resource
+def get_opensearch_client():
+    """
+    One SigV4 client for the whole run, shared by every ingestion thread.
+    Request bodies are gzip-compressed.
+    """
     region = config['region']
     service = 'aoss'
     host = config['opensearch_endpoint']
@@ -48,62 +150,88 @@ def insert_into_opensearch(document):
     credentials = session.get_credentials()
     auth = AWSV4SignerAuth(credentials, region, service)
 
-    client = OpenSearch(
+    return OpenSearch(
         hosts=[{'host': host, 'port': 443}],
         http_auth=auth,
         use_ssl=True,
         verify_certs=True,
+        http_compress=True,
+        timeout=120,
+        pool_maxsize=32,
         connection_class=RequestsHttpConnection
     )
 
+def bulk_writer(max_docs=100, max_bytes=5 * 1024 * 1024, on_done=None, custom_ids=False):
+    """
+    :param custom_ids: Send the manifest's stable ids as _id instead of
+                       matching documents by guide_file_name (see BulkWriter).
+    """
+    key_field = None if custom_ids else 'guide_file_name'
+    return BulkWriter(get_opensearch_client(), config['opensearch_index'], max_docs, max_bytes, on_done=on_done, key_field=key_field)
+
+def bump_index_version():
+    """
+    Mark the index as changed so the chatbot drops its cached search results.
+    :return: The new index version.
+    """
+    return bump_version(get_opensearch_client(), config['opensearch_index'])
+
+def insert_into_opensearch(document, doc_id=None):
+    client = get_opensearch_client()
+
     response = client.index(
         index=config['opensearch_index'],
-        body=document
+        body=document,
+        id=doc_id
     )
 
     print(f"Inserted document: {document['guide_file_name']}")
 
-def insert_document_os(text_data, guide_file_name):
-    max_retries = 10
-    delay = 1
+def parse_report(report):
+    report_text = re.search(r'<report>(\s*{.*?}\s*)</report>', report, re.DOTALL).group(1)
+    return json.loads(report_text)
+
+def build_document(text_data, guide_file_name, data, guide=None):
+    """
+    Assemble the index document from a parsed report, without the embedding.
+    :param guide: Pre-generated step guide, if one was produced.
+    """
+    document = {
+        "guide_title": data["guide_title"],
+        "question_asked": data["question_asked"],
+        "description": data["description"],
+        "passage": text_data,
+        "guide_file_name": guide_file_name
+    }
+
+    # Compact structured form sent to the chat model instead of the raw passage
+    document.update(condensed_fields(
+        data["guide_title"],
+        data.get("steps", []),
+        data.get("prerequisites", []),
+        data.get("key_facts", []),
+    ))
+
+    if guide is not None:
+        document.update(guide_fields(guide, data.get("steps", []), text_data, step_guide_config.get('version', 1)))
+    return document
 
-    # Exponential backoff
-    for attempt in range(1, max_retries + 1):
-        try:
-            report = generate_report(text_data)
-            break
-        except Exception as e:
-            if attempt < max_retries:
-                print(f"Attempt {attempt} for generate_report failed for {guide_file_name}: {e}. Retrying in {delay} seconds...")
-                time.sleep(delay)
-                delay *= 2
-            else:
-                print(f"Max retries reached for generate_report for {guide_file_name}. Aborting insertion.")
-                return
+def insert_document_os(text_data, guide_file_name):
+    data = _with_backoff(report_data, text_data, guide_file_name)
+    if data is None:
+        print(f"Aborting insertion of {guide_file_name}.")
+        return
 
     try:
-
-        report_text = re.search(r'<report>(\s*{.*?}\s*)</report>', report, re.DOTALL).group(1)
-        data = json.loads(report_text)
-
-        embedding = generate_embedding(text_data)
+        guide = None
+        if step_guide_config.get('enabled', True):
+            # Without a guide the chatbot generates one live, so a failure here is not fatal
+            guide = _with_backoff(guide_text, text_data, guide_file_name, max_retries=3)
 
         # Preparing document for OpenSearch
-        document = {
-            "guide_title": data["guide_title"],
-            "question_asked": data["question_asked"],
-            "description": data["description"],
-            "passage": text_data,
-            "embedding": embedding,
-            "guide_file_name": guide_file_name
-        }
+        document = build_document(text_data, guide_file_name, data, guide)
+        document["embedding"] = generate_embedding(text_data)
 
         insert_into_opensearch(document)
     except Exception as e:
         print(f"Inserting {guide_file_name} into opensearch failed due to {e}")
-
-
-
-
-
-
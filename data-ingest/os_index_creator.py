@@ -19,7 +19,7 @@ os_ = OpenSearch(
     use_ssl=True,
     verify_certs=True,
     timeout=300,
-    # http_compress = True, # enables gzip compression for request bodies
+    http_compress = True, # enables gzip compression for request bodies
     connection_class=RequestsHttpConnection
 )
 
@@ -94,6 +94,35 @@ mapping = {
             }
           }
         },
+        "step_guide": {
+          "type": "text",
+          "index": False
+        },
+        "steps": {
+          "type": "text",
+          "index": False
+        },
+        "condensed_passage": {
+          "type": "text",
+          "index": False
+        },
+        "condensed_tokens": {
+          "type": "integer"
+        },
+        "prerequisites": {
+          "type": "text",
+          "index": False
+        },
+        "key_facts": {
+          "type": "text",
+          "index": False
+        },
+        "step_guide_version": {
+          "type": "integer"
+        },
+        "passage_hash": {
+          "type": "keyword"
+        },
         "url": {
           "type": "text",
           "fields": {
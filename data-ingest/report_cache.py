@@ -0,0 +1,182 @@
+"""
+On-disk cache of ingestion LLM results (the generate_report JSON and the
+generated step guide), keyed by hash(kind, article text, prompt template,
+model id). Rebuilding the index with new mappings or embedding settings
+then re-uses every result whose inputs did not change.
+
+Inspect or purge it from the data-ingest directory:
+
+    python report_cache.py stats
+    python report_cache.py list --limit 20
+    python report_cache.py purge --older-than-days 30
+    python report_cache.py purge --all
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'ingest_reports.sqlite')
+
+
+def result_key(kind, text, template, model_id):
+    digest = hashlib.sha256()
+    for part in (kind, model_id, template, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ReportCache:
+    """
+    SQLite store of JSON results, bounded by entry count. The least recently
+    used entries are evicted first. Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, kind TEXT, name TEXT, model_id TEXT, "
+            "created REAL, last_used REAL, value TEXT)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, value, kind="", name="", model_id=""):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, kind, name, model_id, created, last_used, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, name, model_id, now, now, json.dumps(value)),
+            )
+            count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self.evictions += count - self.max_entries
+            self._db.commit()
+
+    def get_or_compute(self, kind, text, template, model_id, compute, name=""):
+        """
+        Return the cached result for these inputs, calling compute() on a miss.
+        Failed computations are not cached.
+        """
+        key = result_key(kind, text, template, model_id)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value, kind, name, model_id)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        with self._lock:
+            rows = self._db.execute("SELECT kind, COUNT(*), SUM(LENGTH(value)) FROM results GROUP BY kind").fetchall()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": {kind: {"count": count, "bytes": size or 0} for kind, count, size in rows},
+        }
+
+    def list(self, limit=50):
+        with self._lock:
+            return self._db.execute(
+                "SELECT key, kind, name, model_id, created, last_used FROM results "
+                "ORDER BY last_used DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def purge(self, older_than_days=None, kind=None, model_id=None):
+        """
+        Delete entries created before older_than_days ago and/or of one kind
+        or model. With no filters every entry is deleted.
+        :return: Number of entries deleted.
+        """
+        clauses, params = [], []
+        if older_than_days is not None:
+            clauses.append("created < ?")
+            params.append(time.time() - older_than_days * 86400)
+        if kind is not None:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if model_id is not None:
+            clauses.append("model_id = ?")
+            params.append(model_id)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            deleted = self._db.execute(f"DELETE FROM results{where}", params).rowcount
+            self._db.commit()
+        return deleted
+
+
+def cache_from_config(config):
+    """
+    Build the cache described by the `report_cache` section of config.yaml.
+    :return: A ReportCache, or None when the cache is disabled.
+    """
+    settings = config.get('report_cache') or {}
+    if not settings.get('enabled', True):
+        return None
+    return ReportCache(settings.get('path', DEFAULT_CACHE_PATH), settings.get('max_entries', 10000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or purge the ingestion result cache.")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Entry counts and sizes per kind")
+    list_parser = commands.add_parser("list", help="Most recently used entries")
+    list_parser.add_argument("--limit", type=int, default=50)
+    purge_parser = commands.add_parser("purge", help="Delete entries")
+    purge_parser.add_argument("--older-than-days", type=float)
+    purge_parser.add_argument("--kind", choices=["report", "guide"])
+    purge_parser.add_argument("--model")
+    purge_parser.add_argument("--all", action="store_true", help="Delete every entry")
+    args = parser.parse_args()
+
+    cache = ReportCache(args.path)
+    if args.command == "stats":
+        for kind, entry in cache.stats()["entries"].items():
+            print(f"{kind}: {entry['count']} entries, {entry['bytes'] / 1024:.0f} KiB")
+    elif args.command == "list":
+        for key, kind, name, model_id, created, last_used in cache.list(args.limit):
+            print(f"{key[:12]}  {kind:<7} {name:<40} {model_id}  last used {time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))}")
+    else:
+        if not (args.all or args.older_than_days is not None or args.kind or args.model):
+            parser.error("purge needs a filter, or --all")
+        print(f"Deleted {cache.purge(args.older_than_days, args.kind, args.model)} entries")
+
+
+if __name__ == "__main__":
+    main()